@@ -0,0 +1,72 @@
+"""Script that benchmarks parsing and cleaning a corpus of saved scorecard pages. By default the corpus is every page in
+the scorecard cache, so no requests are made to PlayCricket.com"""
+
+from io import StringIO
+import argparse
+import contextlib
+import glob
+import io
+import os
+import time
+import pandas as pd
+import read_play_cricket
+import scorecard_cache
+
+
+def load_corpus(folder):
+    """Function that returns a list of the HTML of every saved scorecard page in the given folder
+
+    :param folder The folder of .html files"""
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(folder, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def benchmark(pages, repeat=3):
+    """Function that parses and cleans every batting and bowling scorecard in the given pages in bulk, and returns a
+    dictionary with the number of scorecards and the best time (over the repeats) spent parsing and cleaning them
+
+    :param pages The list of scorecard pages
+    :param repeat The number of times to run the benchmark"""
+
+    # Parse the pages into tables once, timing it
+    start = time.perf_counter()
+    tables = [table for page in pages for table in pd.read_html(StringIO(page))]
+    parse_seconds = time.perf_counter() - start
+    batting_tables = [x for x in tables if read_play_cricket.is_batting_table(x)]
+    bowling_tables = [x for x in tables if read_play_cricket.is_bowling_table(x)]
+
+    # Clean every scorecard at once, treating each batting scorecard as both a batting and an opposition scorecard
+    clean_seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            read_play_cricket.clean_batting_dfs(batting_tables)
+            read_play_cricket.clean_fielding_dfs(batting_tables)
+            for table in bowling_tables:
+                read_play_cricket.clean_bowling_df(table)
+        clean_seconds = min(clean_seconds, time.perf_counter() - start)
+
+    return {'pages': len(pages), 'batting': len(batting_tables), 'bowling': len(bowling_tables),
+            'parse_seconds': parse_seconds, 'clean_seconds': clean_seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parsing and cleaning a corpus of saved scorecards")
+    parser.add_argument('--corpus', default=os.path.join(scorecard_cache.CACHE_DIR, 'pages'),
+                        help="folder of saved scorecard .html files (defaults to the scorecard cache)")
+    parser.add_argument('--repeat', type=int, default=3, help="number of times to run the cleaning benchmark")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        raise Exception(f"No scorecard pages were found in {args.corpus}")
+
+    results = benchmark(pages, args.repeat)
+    scorecards = results['batting'] + results['bowling']
+    print(f"Parsed {results['pages']} pages in {results['parse_seconds'] * 1000:.1f}ms")
+    print(f"Cleaned {results['batting']} batting and {results['bowling']} bowling scorecards in "
+          f"{results['clean_seconds'] * 1000:.1f}ms ({results['clean_seconds'] * 1000 / max(scorecards, 1):.2f}ms each)")
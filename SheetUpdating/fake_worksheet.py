@@ -0,0 +1,88 @@
+"""Module containing a stand-in for a gspread worksheet, so the updater can run without Google Sheets. The worksheet
+is laid out like a weekly sheet, holds its cells in memory and records every batch_update request instead of sending
+it. Run it as a script to check that writing a match to a weekly sheet costs a single request"""
+
+from gspread.utils import a1_to_rowcol
+import pandas as pd
+import argparse
+import os
+import write_google_sheets
+
+# The local mirror of the Google Sheets kept by the web app (see data_sync.py)
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+class FakeWorksheet:
+    """Worksheet laid out like a weekly sheet, with a title row, a header row and then one row per player, with the
+    player names in column B. Writes are applied to the cells in memory and recorded in requests
+
+    :param names The list of player names on the sheet, in sheet order
+    :param title The title of the worksheet (e.g 'Week1')"""
+
+    def __init__(self, names, title='Week1'):
+        self.title = title
+        self.cells = {(2, 2): 'Player Name'}
+        for row, name in enumerate(names, start=3):
+            self.cells[(row, 2)] = name
+
+        # The data of every batch_update request, in the order they were made
+        self.requests = []
+
+    def col_values(self, col):
+        """Returns the values in the given column, from the first row to the last non-empty one ('' for empty cells)
+
+        :param col The column number (e.g 2 for column B)"""
+
+        rows = [row for row, x in self.cells if x == col]
+        return [self.cells.get((row, col), '') for row in range(1, max(rows) + 1)] if rows else []
+
+    def batch_update(self, data):
+        """Records a batch update request and writes its values to the cells
+
+        :param data The list of writes, each a dictionary of the form {'range': 'D5:L5', 'values': [[...]]}"""
+
+        self.requests.append(data)
+        for update in data:
+            first_row, first_col = a1_to_rowcol(update['range'].split(':')[0])
+            for i, values in enumerate(update['values']):
+                for j, value in enumerate(values):
+                    self.cells[(first_row + i, first_col + j)] = value
+        return {'totalUpdatedCells': sum(len(x) for update in data for x in update['values'])}
+
+
+def mirror_worksheet(week_number, data_dir=DATA_DIR):
+    """Function that returns a FakeWorksheet holding the player names of a weekly sheet in the local mirror
+
+    :param week_number The Week Number of the sheet
+    :param data_dir The folder the sheets are mirrored to"""
+
+    names = pd.read_csv(os.path.join(data_dir, f"Week{week_number}.csv"))['Player Name']
+    return FakeWorksheet([str(x).strip() for x in names], title=f"Week{week_number}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that writing a match to a weekly sheet costs a single request")
+    parser.add_argument('--week', type=int, default=1, help="week of the sheet to write to")
+    args = parser.parse_args()
+
+    sheet = mirror_worksheet(args.week)
+    names = write_google_sheets.get_sheet_names(args.week, worksheet=sheet)
+
+    # A match played by the first few players on the sheet
+    bat_df = pd.DataFrame({'BATSMAN': names[:3], 'RUNS': [54, 0, 12], '4s': [6, 0, 1], '6s': [1, 0, 0]})
+    bowl_df = pd.DataFrame({'BOWLER': names[1:3], 'OVERS': [4.0, 3.2], 'WICKETS': [3, 0], 'RUNS': [21, 18],
+                            'MAIDENS': [1, 0]})
+    field_df = pd.DataFrame({'Fielder': names[:1], 'Catches': [2], 'Run-outs': [0], 'Stumpings': [0]})
+
+    # A dry run makes no requests, and a real one makes exactly one
+    write_google_sheets.update_stats(bat_df, bowl_df, field_df, args.week, True, names[0], dry_run=True, worksheet=sheet)
+    if sheet.requests:
+        raise Exception(f"The dry run made {len(sheet.requests)} requests instead of none")
+    updates = write_google_sheets.update_stats(bat_df, bowl_df, field_df, args.week, True, names[0], worksheet=sheet)
+    if len(sheet.requests) != 1 or sheet.requests[0] != updates:
+        raise Exception(f"Writing the match made {len(sheet.requests)} requests instead of 1")
+
+    # Check the batting stats of the first player landed on their row
+    if sheet.cells[(3, 4)] != 1 or sheet.cells[(3, 5)] != 54:
+        raise Exception(f"The batting stats of {names[0]} were not written to row 3")
+    print(f"\nWriting the match made 1 request, covering {len(updates)} ranges")
@@ -1,4 +1,4 @@
-import write_google_sheets, read_play_cricket
+import pipeline
 
 week_one = ['https://uniofwarwick.play-cricket.com/website/results/4050085',
 'https://uniofwarwick.play-cricket.com/website/results/4050303', 
@@ -17,30 +17,12 @@ week_three = ['https://uniofwarwick.play-cricket.com/website/results/4026201',
 week_four = ['https://uniofwarwick.play-cricket.com/website/results/4057064',
 'https://uniofwarwick.play-cricket.com/website/results/4057064']
 
-# Update week 1
-for link in week_one:
-    print("\nThe current iteration uses this link: " + link)
-    bat_df, bowl_df, field_df = read_play_cricket.clean_scorecards(link)
-    write_google_sheets.update_stats(bat_df, bowl_df, field_df, 1)
-    print("\n Successfully updated stats for the game using this link: " + link)
+# The result of each match, read from match_results.json (see pipeline.load_results). Matches left out aren't written,
+# and are added to the review queue
+results = pipeline.load_results()
 
-# Update week 2
-for link in week_two:
-    print("\nThe current iteration uses this link: " + link)
-    bat_df, bowl_df, field_df = read_play_cricket.clean_scorecards(link)
-    write_google_sheets.update_stats(bat_df, bowl_df, field_df, 2)
-    print("\n Successfully updated stats for the game using this link: " + link)
+# The league table from the local mirror of the sheets, updated as each match is written
+standings = pipeline.load_standings()
 
-# Update week 3
-for link in week_three:
-    print("\nThe current iteration uses this link: " + link)
-    bat_df, bowl_df, field_df = read_play_cricket.clean_scorecards(link)
-    write_google_sheets.update_stats(bat_df, bowl_df, field_df, 3)
-    print("\n Successfully updated stats for the game using this link: " + link)
-
-# Update week 4
-for link in week_four:
-    print("\nThe current iteration uses this link: " + link)
-    bat_df, bowl_df, field_df = read_play_cricket.clean_scorecards(link)
-    write_google_sheets.update_stats(bat_df, bowl_df, field_df, 4)
-    print("\n Successfully updated stats for the game using this link: " + link)
\ No newline at end of file
+# Fetch every scorecard at once, then update the weeks in order
+pipeline.run_updates({1: week_one, 2: week_two, 3: week_three, 4: week_four}, results, standings=standings)
@@ -0,0 +1,90 @@
+"""Module containing the name resolver, which matches the names on a PlayCricket scorecard to the names on the sheet.
+Names are matched exactly, then through the aliases file, then ignoring case and punctuation, then by surname, and
+finally by fuzzy matching. Names that still can't be matched are left for the review queue"""
+
+import difflib
+import json
+import os
+import re
+
+# Scorecard names that can't be matched automatically can be added to this file as {"scorecard name": "sheet name"}
+NAME_ALIASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'name_aliases.json')
+
+# The lowest similarity accepted by the fuzzy match, and how far ahead of the runner-up the best match must be
+FUZZY_CUTOFF = 0.85
+FUZZY_MARGIN = 0.05
+
+
+def load_aliases(path=NAME_ALIASES_FILE):
+    """Function that returns the dictionary of aliases from the aliases file, or an empty dictionary if there isn't one
+
+    :param path The aliases file"""
+
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def normalise(name):
+    """Function that returns the given name in lower case with everything except letters and spaces removed
+
+    :param name The name to normalise"""
+
+    return ' '.join(re.sub(r"[^a-z ]", '', str(name).lower()).split())
+
+
+def resolve_name(name, sheet_names, aliases=None):
+    """Function that returns the name on the sheet that the given scorecard name refers to, or None if there isn't
+    exactly one convincing match
+
+    :param name The name from the scorecard
+    :param sheet_names The list of names on the sheet
+    :param aliases A dictionary from scorecard names to sheet names (defaults to the aliases file)"""
+
+    name = ' '.join(str(name).split())
+
+    # Exact matches
+    if name in sheet_names:
+        return name
+
+    # Aliases that have been added by hand
+    if aliases is None:
+        aliases = load_aliases()
+    if aliases.get(name) in sheet_names:
+        return aliases[name]
+
+    # Matches ignoring case and punctuation
+    normalised_names = {}
+    for sheet_name in sheet_names:
+        normalised_names.setdefault(normalise(sheet_name), []).append(sheet_name)
+    key = normalise(name)
+    if len(normalised_names.get(key, [])) == 1:
+        return normalised_names[key][0]
+
+    # Surname matches (e.g 'Royle' or 'C Royle' for 'Charlie Royle'), as long as only one player has that surname
+    words = key.split()
+    if words:
+        surname_matches = [x for x in sheet_names if normalise(x).split()[-1:] == words[-1:]
+                           and (len(words) == 1 or normalise(x).startswith(words[0][0]))]
+        if len(surname_matches) == 1:
+            return surname_matches[0]
+
+    # Fuzzy matches, accepted only when the best match is clearly better than the next one
+    scores = sorted(((difflib.SequenceMatcher(None, key, x).ratio(), x) for x in normalised_names), reverse=True)
+    if scores and scores[0][0] >= FUZZY_CUTOFF and len(normalised_names[scores[0][1]]) == 1:
+        if len(scores) == 1 or scores[0][0] - scores[1][0] >= FUZZY_MARGIN:
+            return normalised_names[scores[0][1]][0]
+
+    return None
+
+
+def suggestions(name, sheet_names, n=3):
+    """Function that returns the names on the sheet closest to the given name, for the review queue
+
+    :param name The name from the scorecard
+    :param sheet_names The list of names on the sheet
+    :param n The maximum number of suggestions"""
+
+    return difflib.get_close_matches(str(name), sheet_names, n=n, cutoff=0.5)
@@ -0,0 +1,125 @@
+"""Module containing the pipelined updater. All the scorecards for a run are fetched concurrently by a bounded pool of
+threads, while the matches are cleaned and written to the sheets in order, one week after another"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import time
+import write_google_sheets, read_play_cricket, review_queue
+import sheet_cache
+import standings_engine
+
+# The maximum number of scorecards fetched at once
+MAX_CONCURRENT_FETCHES = 8
+
+# The file holding the result of each match, kept next to the updater
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'match_results.json')
+
+# The web app's local mirror of the sheets, in the top level of the repository
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), sheet_cache.DATA_DIR)
+
+
+def load_results(path=None):
+    """Function that reads the match results file and returns a dictionary from each link to a tuple (warwick_win, motm).
+    The file is a JSON object from each link to an object of the form {"warwick_win": true, "motm": "Name On Sheet"},
+    where motm may be null. Returns an empty dictionary if the file doesn't exist
+
+    :param path The match results file (defaults to RESULTS_FILE)"""
+
+    path = path or RESULTS_FILE
+    if not os.path.exists(path):
+        print(f"\nNo match results file was found at {path}, so every match will be held for review")
+        return {}
+
+    with open(path) as f:
+        return {link: (bool(result['warwick_win']), result.get('motm')) for link, result in json.load(f).items()}
+
+
+def load_standings(data_dir=DATA_DIR):
+    """Function that returns the standings engine (see standings_engine.py) built from the web app's local mirror of the
+    sheets, so each match can be added to the league table as soon as its scorecard is ingested
+
+    :param data_dir The web app's data folder"""
+
+    # The updater runs from its own folder, so point the sheet cache at the web app's data folder
+    sheet_cache.DATA_DIR = data_dir
+    return standings_engine.get_standings()
+
+
+def fetch_all(links, max_workers=MAX_CONCURRENT_FETCHES, offline=None):
+    """Function that starts fetching every scorecard in the given list of links, and returns a dictionary from each link
+    to a future of its tables. Links that appear more than once are only fetched once.
+
+    :param links The list of scorecard links to fetch
+    :param max_workers The maximum number of scorecards to fetch at once
+    :param offline If True, the scorecards are only read from the scorecard cache"""
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {link: executor.submit(read_play_cricket.fetch_tables, link, offline) for link in dict.fromkeys(links)}
+
+    # Let the threads finish in the background. The futures are still usable once the executor has been shut down
+    executor.shutdown(wait=False)
+    return futures
+
+
+def run_updates(weekly_links, results=None, max_workers=MAX_CONCURRENT_FETCHES, offline=None, dry_run=False,
+                worksheets=None, standings=None):
+    """Function that updates the sheets with every match in the given weeks. Every scorecard is fetched up front and in
+    parallel, then the matches are written in order, so the writes for each week happen in the same order as the links.
+    Nothing is asked for on the command line: matches that need a person to look at them are added to the review queue
+    and skipped. Returns the list of links that were skipped
+
+    :param weekly_links A dictionary from each week number to the list of scorecard links for that week
+    :param results A dictionary from each link to a tuple (warwick_win, motm), e.g. from load_results(). Matches without
+    a result aren't written, since their bonuses would be wrong, and are added to the review queue instead
+    :param max_workers The maximum number of scorecards to fetch at once
+    :param offline If True, the scorecards are only read from the scorecard cache, so no requests are made to
+    PlayCricket.com (defaults to the SCORECARD_OFFLINE environment variable)
+    :param dry_run If True, the planned writes are printed instead of being sent to the sheet
+    :param worksheets A dictionary from each week number to the worksheet to read the roster from and write to instead
+    of the Google Sheet (e.g. FakeWorksheets, so the updater runs offline). The roster is read from week 1
+    :param standings The standings engine (e.g. from load_standings()) each written match is applied to, so the league
+    table is updated as soon as the match is ingested"""
+
+    start = time.perf_counter()
+    futures = fetch_all([link for links in weekly_links.values() for link in links], max_workers, offline)
+    results = results or {}
+    worksheets = worksheets or {}
+    skipped = []
+
+    # The names on the sheet, used to pick out Warwick's scorecards
+    roster = write_google_sheets.get_sheet_names(worksheet=worksheets.get(1))
+
+    # Write the matches in order. Waiting on a match's future only blocks until that page has arrived, while the
+    # remaining pages keep downloading in the background
+    for week_number in sorted(weekly_links):
+        for link in weekly_links[week_number]:
+            print("\nThe current iteration uses this link: " + link)
+            if link not in results:
+                review_queue.add('result', link, week=week_number)
+                print("\nSkipped the game using this link, since its result hasn't been entered")
+                skipped.append(link)
+                continue
+            warwick_win, motm = results[link]
+
+            try:
+                bat_df, bowl_df, field_df = read_play_cricket.clean_scorecards(link, roster, tables=futures[link].result())
+                write_google_sheets.update_stats(bat_df, bowl_df, field_df, week_number, warwick_win, motm,
+                                                 match_url=link, dry_run=dry_run, worksheet=worksheets.get(week_number))
+            except review_queue.NeedsReview as e:
+                print(f"\nSkipped the game using this link, since it needs reviewing: {e}")
+                skipped.append(link)
+                continue
+            print("\n Successfully updated stats for the game using this link: " + link)
+
+            # Add the match to the league table and report the teams that moved
+            if standings is not None and not dry_run:
+                changes = standings.apply_match(week_number, bat_df, bowl_df, field_df, warwick_win, motm)
+                for team, (old_position, new_position) in changes['teams'].items():
+                    if old_position != new_position:
+                        print(f"{team} moved from position {old_position} to {new_position} in the league table")
+
+    matches = sum(len(x) for x in weekly_links.values())
+    print(f"\nUpdated {matches - len(skipped)} of {matches} matches ({len(futures)} unique scorecards) in "
+          f"{time.perf_counter() - start:.1f}s. The rest need reviewing")
+    return skipped
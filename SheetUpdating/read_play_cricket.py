@@ -1,54 +1,75 @@
 """Module containing functions that fetch scorecards from PlayCricket.com, clean them and
  put the data into pandas dataframes"""
 
+from io import StringIO
+import numpy as np
 import pandas as pd
-import re
+import review_queue
+import scorecard_cache
 
 
-def clean_batting_df(batting_scorecard):
-    """Function that cleans the batting scorecard
+def clean_batsman_names(cells, first_parts, second_parts):
+    """Function that returns a list of the batsmen's names, given the cells of the batsman column and the two columns
+    describing the mode of dismissal (which is squashed onto each batsman's name on the page)
 
-    :param batting_scorecard: Warwick's batting scorecard (as a dataframe) obtained from the function get_tables
+    :param cells: The batsman column, with any NaN values replaced with 0s
+    :param first_parts: The first mode of dismissal column, with any NaN values replaced with 0s
+    :param second_parts: The second mode of dismissal column, with any NaN values replaced with 0s
+    """
+
+    # Identify the clutter
+    how_out = first_parts.astype(str) + second_parts.astype(str)
+    how_out = how_out.where(~((first_parts == 0) | (second_parts == 0)), how_out.str.replace('0', ''))
+    how_out = how_out.str.replace(' ', '')
+
+    # Remove the whitespace, then the clutter. Each row has its own clutter to remove
+    cells = cells.str.replace(r"\s+", '', regex=True)
+    names = pd.Series([cell.replace(clutter, '') for cell, clutter in zip(cells, how_out)], dtype=object).str.strip()
+
+    # Put space before any capital letter to separate the person's first name and last name
+    return names.str.replace(r"(\w)([A-Z])", r"\1 \2", regex=True).tolist()
+
+
+def clean_batting_dfs(batting_scorecards):
+    """Function that cleans a list of batting scorecards at once, and returns the list of cleaned scorecards. The names
+    of every scorecard are cleaned in one pass, so a whole archive of scorecards can be cleaned quickly
+
+    :param batting_scorecards: A list of batting scorecards (as dataframes) obtained from the function get_tables
     """
-    # Rename batting scorecard for ease
-    df = batting_scorecard
 
     # Replace any NaN values with 0s
-    df = df.fillna(0)
+    dfs = [df.fillna(0) for df in batting_scorecards]
+    if not dfs:
+        return []
 
-    # Clean the cells in the batsman column
-    clean_cells = []
-    for i in range(0, df.shape[0]):
+    # Clean the cells in the batsman column of every scorecard
+    columns = pd.concat([df.iloc[:, :3].set_axis([0, 1, 2], axis=1) for df in dfs], ignore_index=True)
+    names = clean_batsman_names(columns[0], columns[1], columns[2])
 
-        # Identify the clutter
-        if df.iat[i, 1] == 0 or df.iat[i, 2] == 0:
-            how_out = str(df.iat[i, 1]) + str(df.iat[i, 2])
-            how_out = (how_out.replace('0', ''))
-            how_out = how_out.replace(' ', '')
-        else:
-            how_out = df.iat[i, 1] + df.iat[i, 2]
-            how_out = (how_out.replace(' ', ''))
+    cleaned_dfs = []
+    start = 0
+    for df in dfs:
+        # Update the batsman column with the cleaned cells
+        df = df.assign(BATSMAN=names[start:start + len(df)])
+        start += len(df)
 
-        # Remove the clutter
-        batsman_cell = ''.join(df.iat[i, 0].split())  # Remove whitespace
-        cleaned_cell = batsman_cell.replace(how_out, '').strip()  # Remove how_out
+        # Remove the two redundant columns (the unnamed columns)
+        df = df.drop(df.columns[[1, 2]], axis=1)
 
-        # Put space before any capital letter to separate the person's first name and last name
-        cleaned_cell = re.sub(r"(\w)([A-Z])", r"\1 \2", cleaned_cell)
+        # Change the names of the runs and balls columns
+        df.rename(columns={'RUNSR': 'RUNS', 'BALLSB': 'BALLS'}, inplace=True)
+        cleaned_dfs.append(df)
 
-        # Append the cleaned element
-        clean_cells.append(cleaned_cell)
+    return cleaned_dfs
 
-    # Update the batsman column with the cleaned cells
-    df = df.assign(BATSMAN=clean_cells)
 
-    # Remove the two redundant columns (the unnamed columns)
-    df = df.drop(df.columns[[1, 2]], axis=1)
+def clean_batting_df(batting_scorecard):
+    """Function that cleans the batting scorecard
 
-    # Change the names of the runs and balls columns
-    df.rename(columns={'RUNSR': 'RUNS', 'BALLSB': 'BALLS'}, inplace=True)
+    :param batting_scorecard: Warwick's batting scorecard (as a dataframe) obtained from the function get_tables
+    """
 
-    return df
+    return clean_batting_dfs([batting_scorecard])[0]
 
 
 def clean_bowling_df(bowling_scorecard):
@@ -70,6 +91,62 @@ def clean_bowling_df(bowling_scorecard):
     return df
 
 
+# The fielding stats, in the order of the fielding dataframe's columns
+FIELDING_COLUMNS = ['Catches', 'Run-outs', 'Stumpings']
+
+
+def clean_fielding_dfs(oppo_batting_scorecards):
+    """Function that uses a list of opposition batting scorecards to return a list of dataframes of fielding stats. The
+    dismissals of every scorecard are counted in one pass, so a whole archive of scorecards can be cleaned quickly
+
+    :param oppo_batting_scorecards: A list of the opposition's batting scorecards (as dataframes) obtained from the
+    function get_tables
+    """
+
+    # Empty scorecards are returned as they are
+    fielding_dfs = list(oppo_batting_scorecards)
+    non_empty = [i for i, df in enumerate(fielding_dfs) if not df.empty]
+    if not non_empty:
+        return fielding_dfs
+
+    # Keep only the two columns describing the mode of dismissal, and replace any NaN values with 0s
+    df = pd.concat([fielding_dfs[i].iloc[:, [1, 2]].set_axis(['A', 'B'], axis=1) for i in non_empty], keys=non_empty)
+    df = df.fillna(0)
+    a = df['A'].astype(str)
+    b = df['B'].astype(str)
+
+    # Delete any lbw rows, not out rows, did not bat rows, rows where the mode of dismissal is bowled and rows where the
+    # mode of dismissal is unsure
+    keep = ~df['A'].isin(['lbw', 'not out', 'did not bat'])
+    keep &= ~((df['A'] == 0) & (b.str[:1] == 'b'))
+    keep &= ~(a.str.lower().str.contains('unsure', regex=False) | b.str.lower().str.contains('unsure', regex=False))
+    a = a[keep]
+    b = b[keep]
+
+    # Work out the mode of dismissal and the name of the person who got the catch/runout/stumping
+    conditions = [b.str[:6] == 'ct & b', a.str[:1] == 'c', a.str[:8] == 'run out', a.str[:2] == 'st']
+    dismissals = pd.DataFrame({'Scorecard': a.index.get_level_values(0),
+                               'Fielder': np.select(conditions, [b.str[7:], a.str[1:], a.str[7:], a.str[2:]], None),
+                               'Stat': np.select(conditions, ['Catches', 'Catches', 'Run-outs', 'Stumpings'], None)})
+    dismissals = dismissals.dropna()
+
+    # Count each fielder's catches, run outs and stumpings. For example, a row 'Charlie Royle', 2, 1, 0 would mean that
+    # Charlie Royle took 2 catches, 1 run out and 0 stumpings
+    counts = dismissals.groupby(['Scorecard', 'Fielder', 'Stat'], sort=False).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=FIELDING_COLUMNS, fill_value=0).rename_axis(columns=None)
+    counts_by_scorecard = dict(iter(counts.groupby(level='Scorecard', sort=False)))
+
+    for i in non_empty:
+        if i in counts_by_scorecard:
+            fielding_dfs[i] = counts_by_scorecard[i].droplevel('Scorecard').reset_index()
+        else:
+            print('The fielding stats are empty. Either the stats were not available on Play Cricket, or there were no'
+                  ' catches, stumpings or run-outs')
+            fielding_dfs[i] = pd.DataFrame()
+
+    return fielding_dfs
+
+
 def clean_fielding_df(oppo_batting_scorecard):
     """Function that uses the opposition's batting scorecard to return a dataframe of fielding stats
 
@@ -77,194 +154,130 @@ def clean_fielding_df(oppo_batting_scorecard):
     get_tables
     """
 
-    # Rename oppo_batting_scorecard for ease
-    df = oppo_batting_scorecard
-
-    # Return empty dataframe if the opposition batting scorecard is empty
-    if df.empty:
-        return df
-    
-    else:
-        # Remove unecessary columns
-        df.drop(df.columns[[0, 3, 4, 5, 6, 7]], axis=1, inplace=True)
-
-        # Remame two remaining columns
-        df.rename(columns={'Unnamed: 1': 'A', 'Unnamed: 2': 'B'}, inplace=True)
-
-        # Replace any NaN values with 0s
-        df = df.fillna(0)
-
-        # Delete any lbw rows, not out rows and did not bat rows
-        df = df[df.A != 'lbw']
-        df = df[df.A != 'not out']
-        df = df[df.A != 'did not bat']
-
-        # Delete any rows where the mode of dismissal is bowled.
-        for index in df.index:
-            if df['A'][index] == 0 and df['B'][index][0] == 'b':
-                df.drop([index], inplace=True)
-
-        # Delete any rows where the mode of dismissal is unsure
-        for index in df.index:
-            unsure_a = str(df['A'][index]).lower()
-            unsure_b = str(df['B'][index]).lower()
-            
-            if 'unsure' in unsure_a or 'unsure' in unsure_b:
-                df.drop([index], inplace=True)
-
-        # Get stats on catches, run outs and stumpings and store them in list
-        catches = []
-        run_outs = []
-        stumpings = []
-        for index in df.index:
-            # Boolean values to determine the method of dismissal
-            caught = str(df['A'][index])[0] == 'c'
-            stumped = str(df['A'][index])[0:2] == 'st'
-            run_out = str(df['A'][index])[0:8] == 'run out'
-            c_and_b = str(df['B'][index])[0:6] == 'ct & b'
-
-            # Get the name of the person who got the catch/runout/stumping and add the dismissal to the relevant list
-            if c_and_b:
-                name = df['B'][index][7:]
-                catches.append(name)
-            elif caught:
-                name = df['A'][index][1:]
-                catches.append(name)
-            elif run_out:
-                name = df['A'][index][7:]
-                run_outs.append(name)
-            elif stumped:
-                name = df['A'][index][2:]
-                stumpings.append(name)
-
-        # Get a list of unique fielders without losing old data
-        copy_catches = catches.copy()
-        copy_run_outs = run_outs.copy()
-        copy_stumpings = stumpings.copy()
-
-        catches.extend(run_outs)
-        catches.extend(stumpings)
-        unique_fielders = list(set(catches))
-
-        # Store fielding stats in dictionary. The dictionary has the names as keys, and a list of length 3 as values. For
-        # example, 'Charlie Royle': [2, 1, 0] would mean that Charlie Royle took 2 catches, 1 run out and 0 stumpings
-        fielding_stats = {}
-        for name in unique_fielders:
-            fielding_stats[unique_fielders.index(name)] = [name, copy_catches.count(name),
-                                                        copy_run_outs.count(name), copy_stumpings.count(name)]
-
-        # Convert dictionary to dataframe and rename columns (if dataframe is non-empty)
-        fielding_df = pd.DataFrame.from_dict(fielding_stats, orient='index')
-        if not fielding_df.empty:
-            fielding_df.columns = ['Fielder', 'Catches', 'Run-outs', 'Stumpings']
-        else:
-            print('The fielding stats are empty. Either the stats were not available on Play Cricket, or there were no'
-                ' catches, stumpings or run-outs')
+    return clean_fielding_dfs([oppo_batting_scorecard])[0]
 
-        return fielding_df
 
+def fetch_tables(match_url, offline=None):
+    """Function that fetches the scorecard page and returns all the tables on it as a list of dataframes. This is the
+    slow, network-bound part of reading a scorecard, so it is safe to run for several matches at once. Pages come from
+    the scorecard cache, so rerunning a match only asks PlayCricket.com whether the page has changed.
 
-def get_tables(match_url):
+    :param str match_url: The URL of the scorecard on PlayCricket.com
+    :param offline: If True, the page is only read from the cache (defaults to the SCORECARD_OFFLINE environment variable)
+    """
+
+    return pd.read_html(StringIO(scorecard_cache.fetch_html(match_url, offline)))
+
+
+def is_batting_table(table):
+    """Function that returns True if the given table has the columns of a batting scorecard
+
+    :param table: A table from the scorecard page
+    """
+
+    columns = [str(x).upper() for x in table.columns]
+    return not table.empty and 'BATSMAN' in columns[:1] and any(x.startswith('RUNS') for x in columns)
+
+
+def is_bowling_table(table):
+    """Function that returns True if the given table has the columns of a bowling scorecard
+
+    :param table: A table from the scorecard page
+    """
+
+    columns = [str(x).upper() for x in table.columns]
+    return not table.empty and 'BOWLER' in columns[:1] and any(x.startswith('OVERS') for x in columns)
+
+
+def roster_overlap(names, roster):
+    """Function that returns the number of cells in the given column of names that contain a name from the roster.
+    Whitespace is ignored, since the batting cells have the mode of dismissal squashed onto the batsman's name
+
+    :param names: The column of names (e.g the BATSMAN or BOWLER column of a scorecard)
+    :param roster: The list of names on the sheet
+    """
+
+    squashed_roster = [''.join(str(x).split()).lower() for x in roster if str(x).strip()]
+    squashed_names = [''.join(str(x).split()).lower() for x in names]
+    return sum(any(x in name for x in squashed_roster) for name in squashed_names)
+
+
+def classify_tables(tables, roster):
+    """Function that picks Warwick's batting scorecard, Warwick's bowling scorecard and the opposition's batting
+    scorecard out of the tables on a scorecard page. Batting and bowling scorecards are told apart by their columns, and
+    Warwick's are the ones with the most players from the roster. Returns None if the tables can't be identified
+
+    :param tables: The tables on the scorecard page
+    :param roster: The list of names on the sheet
+    """
+
+    batting_tables = [x for x in tables if is_batting_table(x)]
+    bowling_tables = [x for x in tables if is_bowling_table(x)]
+
+    def pick_warwick_table(candidates):
+        # Warwick's table must contain someone from the roster, and more of them than any other table
+        overlaps = sorted(((roster_overlap(x.iloc[:, 0], roster), i) for i, x in enumerate(candidates)), reverse=True)
+        if not overlaps or overlaps[0][0] == 0 or (len(overlaps) > 1 and overlaps[0][0] == overlaps[1][0]):
+            return None
+        return overlaps[0][1]
+
+    batting_index = pick_warwick_table(batting_tables)
+    bowling_index = pick_warwick_table(bowling_tables)
+    if batting_index is None or bowling_index is None:
+        return None
+
+    # The opposition's batting scorecard is the other batting scorecard, if it is on the page
+    other_batting_tables = [x for i, x in enumerate(batting_tables) if i != batting_index]
+    if len(other_batting_tables) > 1:
+        return None
+    oppo_batting_scorecard = other_batting_tables[0] if other_batting_tables else pd.DataFrame()
+
+    return batting_tables[batting_index], bowling_tables[bowling_index], oppo_batting_scorecard
+
+
+def get_tables(match_url, roster, tables=None):
     """Function that returns a tuple of length 3. The first element of the tuple is the batting scorecard as a
     dataframe (ready for editing), the second element is the bowling scorecard as a dataframe (ready for editing). The
     third element is the opposition's batting scorecard (ready for editing), which will be used to get fielding stats.
+    If the scorecards can't be identified, the match is added to the review queue and NeedsReview is raised.
 
     :param str match_url: The URL of the scorecard on PlayCricket.com
+    :param roster: The list of names on the sheet, used to tell Warwick's scorecards from the opposition's
+    :param tables: The tables on the scorecard page, if they have already been fetched with fetch_tables
     """
 
     # Fetch all the tables on the page and store them in a list of dataframes
-    tables = pd.read_html(match_url)
-
-    # Get correct batting and bowling scorecards using user input
-    # Case where all relevant tables are on the page
-    if len(tables) >= 7:
-        
-        valid_user_input = False
-        while not valid_user_input:
-            print(tables[1])
-            print("\n Is this Warwick's batting scorecard? This information will be used to get the correct data from the website.\n")
-            x = input("Type 'y' or 'n' then press enter.")
-            
-            if x.strip() == 'y':
-                batting_scorecard = tables[1]
-                bowling_scorecard = tables[6]
-                oppo_batting_scorecard = tables[4]
-                valid_user_input = True
-            elif x.strip() == 'n':
-                batting_scorecard = tables[4]
-                bowling_scorecard = tables[3]
-                oppo_batting_scorecard = tables[1]
-                valid_user_input = True
-            else:
-                print("\n Your input was invalid. Remember to type in 'y' or 'n'. Please try again!\n")
-
-    # Case where there are some tables missing on the page. Prompt user for input to find each of the relevant tables
-    else:
-        # Get rid of the unecessary first table and any empty dataframes
-        tables.pop(0)
-        non_empty_tables = []
-        for table in tables:
-            if not table.empty:
-                non_empty_tables.append(table)
-
-        # Inform user of missing data
-        print("\nThere was some data missing on the webpage so I need your help to find the correct scorecards\n")
-
-        # Find batting scorecard
-        found_batting_scorecard = False
-        for index, table in enumerate(non_empty_tables):
-            print(table)
-            print("\nIs this Warwick's batting scorecard? This information will be used to get the correct data from the website.\n")
-            x = input("Type 'y' or 'n' and then press enter.")
-            
-            if x.strip() == 'y':
-                found_batting_scorecard = True
-                batting_scorecard = non_empty_tables[index]
-                batting_scorecard_index = index
-                break
-            else:
-                print("\n")
-        
-        # Remove batting scorecard from list since it's already been found.
-        non_empty_tables.pop(batting_scorecard_index)
-        
-        # Inform user in the case that the batting scorecard could not be found
-        if not found_batting_scorecard:
-            print("\nI was unable to find the batting scorecard. Rerun the program and check you didn't miss it or input the data manually to the spreadsheet.\n")
-
-        # Find bowling scorecard
-        found_bowling_scorecard = False
-        for index, table in enumerate(non_empty_tables):
-            print(table)
-            print("\nIs this Warwick's bowling scorecard? This information will be used to get the correct data from the website.\n")
-            x = input("Type 'y' or 'n' and then press enter.")
-            if x.strip() == 'y':
-                found_bowling_scorecard = True
-                bowling_scorecard = non_empty_tables[index]
-                break
-            else:
-                print("\n")
-
-        # Inform user in the case that the bowling scorecard could not be found
-        if not found_bowling_scorecard:
-            print("I was unable to find the bowling scorecard. Rerun the program and check you didn't miss it")
-
-        print("\nThe fielding stats were not found since the opposition's batting scorecard was not found on the page. Please enter them manually to the spreadsheet")
-        oppo_batting_scorecard = pd.DataFrame()
-
-    return batting_scorecard, bowling_scorecard, oppo_batting_scorecard
-
-
-def clean_scorecards(match_url):
+    if tables is None:
+        tables = fetch_tables(match_url)
+
+    # Identify the scorecards from their columns and the players in them
+    scorecards = classify_tables(tables, roster)
+    if scorecards is None:
+        review_queue.add('tables', match_url, tables=[list(map(str, x.columns)) for x in tables])
+        raise review_queue.NeedsReview(f"The scorecards on {match_url} could not be identified")
+
+    # Inform user of missing data
+    if scorecards[2].empty:
+        print("\nThe fielding stats were not found since the opposition's batting scorecard was not found on the page. "
+              "Please enter them manually to the spreadsheet")
+
+    return scorecards
+
+
+def clean_scorecards(match_url, roster, tables=None):
     """Function that returns a tuple of length 3. The first element of the tuple is the cleaned batting scorecard as a
     dataframe, the second element is a cleaned bowling scorecard as a dataframe. The 3rd elemeent is a dataframe
     containing the mode of dismissal for each wicket
 
     :param str match_url: The URL of the scorecard on PlayCricket.com
+    :param roster: The list of names on the sheet, used to tell Warwick's scorecards from the opposition's
+    :param tables: The tables on the scorecard page, if they have already been fetched with fetch_tables
     """
 
-    # Get the unclean scorecards
-    dirty_batting, dirty_bowling, dirty_oppo_batting = get_tables(match_url)
+    # Get the unclean scorecards. The cleaning functions edit the tables in place, so work on copies
+    if tables is not None:
+        tables = [table.copy() for table in tables]
+    dirty_batting, dirty_bowling, dirty_oppo_batting = get_tables(match_url, roster, tables)
 
     # Clean the batting and bowling scorecards
     df_bat = clean_batting_df(dirty_batting)
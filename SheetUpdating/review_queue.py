@@ -0,0 +1,50 @@
+"""Module containing the review queue. Anything the updater can't work out on its own (a scorecard whose tables can't
+be identified, a name that isn't on the sheet, a match with no result) is appended to a JSON lines file instead of
+asking for input, so scorecards can be ingested unattended and checked afterwards"""
+
+import datetime
+import json
+import os
+import threading
+
+# The review queue file, kept next to the updater
+REVIEW_QUEUE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'review_queue.jsonl')
+
+# Lock guarding writes to the queue, since scorecards may be processed on several threads
+_lock = threading.Lock()
+
+
+class NeedsReview(Exception):
+    """Raised when a match can't be ingested until someone has looked at its review queue entry"""
+
+
+def add(kind, match_url, path=None, **details):
+    """Function that appends an entry to the review queue and returns it
+
+    :param kind What needs reviewing (e.g 'tables', 'names' or 'result')
+    :param match_url The URL of the scorecard the entry is about
+    :param path The review queue file (defaults to REVIEW_QUEUE_FILE)
+    :param details Anything else that will help the reviewer (e.g the unresolved names and their closest matches)"""
+
+    entry = {'time': datetime.datetime.now().isoformat(timespec='seconds'), 'kind': kind, 'match_url': match_url}
+    entry.update(details)
+
+    with _lock:
+        with open(path or REVIEW_QUEUE_FILE, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    print(f"\nAdded a '{kind}' entry to the review queue for {match_url}")
+    return entry
+
+
+def pending(path=None):
+    """Function that returns the list of entries in the review queue
+
+    :param path The review queue file (defaults to REVIEW_QUEUE_FILE)"""
+
+    path = path or REVIEW_QUEUE_FILE
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
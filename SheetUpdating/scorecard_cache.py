@@ -0,0 +1,150 @@
+"""Module containing the on-disk cache of raw scorecard pages from PlayCricket.com. Pages are stored by the hash of their
+content, and each match ID points at the page it was last seen with, along with the ETag and Last-Modified headers
+used to revalidate it. Once a match has been fetched or revalidated in a run it isn't requested again, and in offline
+mode the network is never used"""
+
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import requests
+
+# The cache folder, kept next to the updater unless SCORECARD_CACHE_DIR is set
+CACHE_DIR = os.environ.get('SCORECARD_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scorecard_cache'))
+
+# Set SCORECARD_OFFLINE=1 to only ever read scorecards from the cache
+OFFLINE = os.environ.get('SCORECARD_OFFLINE', '') not in ('', '0')
+
+# How long to wait for PlayCricket.com before giving up, in seconds
+TIMEOUT = 30
+
+# The matches fetched or revalidated by this process, and a lock for each match so concurrent requests for the same
+# match only fetch it once
+_fresh = set()
+_match_locks = {}
+_lock = threading.Lock()
+
+
+def match_id(match_url):
+    """Function that returns the match ID in a scorecard URL (e.g '4057064' for
+    'https://uniofwarwick.play-cricket.com/website/results/4057064'), or a hash of the URL if it doesn't contain one
+
+    :param match_url The URL of the scorecard on PlayCricket.com"""
+
+    match = re.search(r"/results/(\d+)", match_url)
+    if match:
+        return match.group(1)
+    return hashlib.sha1(match_url.encode()).hexdigest()[:16]
+
+
+def _page_path(digest):
+    return os.path.join(CACHE_DIR, 'pages', f"{digest}.html")
+
+
+def _entry_path(match):
+    return os.path.join(CACHE_DIR, 'matches', f"{match}.json")
+
+
+def _write_atomically(path, data):
+    # Write to a temporary file and rename it, so a half-written file is never read
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def load_entry(match):
+    """Function that returns the cache entry of the given match ID, or None if it hasn't been cached
+
+    :param match The match ID"""
+
+    path = _entry_path(match)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        entry = json.load(f)
+
+    # Ignore entries whose page has gone missing
+    return entry if os.path.exists(_page_path(entry['sha256'])) else None
+
+
+def read_page(entry):
+    """Function that returns the HTML of a cached page
+
+    :param entry The cache entry of the match, from load_entry"""
+
+    with open(_page_path(entry['sha256']), 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def store_page(match_url, html, etag=None, last_modified=None):
+    """Function that adds a page to the cache and points its match ID at it. Returns the new cache entry
+
+    :param match_url The URL of the scorecard on PlayCricket.com
+    :param html The HTML of the page
+    :param etag The ETag header the page was served with
+    :param last_modified The Last-Modified header the page was served with"""
+
+    data = html.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+
+    # Pages are named by their content, so a page that hasn't changed is only stored once
+    if not os.path.exists(_page_path(digest)):
+        _write_atomically(_page_path(digest), data)
+
+    entry = {'match_url': match_url, 'sha256': digest, 'etag': etag, 'last_modified': last_modified,
+             'fetched': datetime.datetime.now().isoformat(timespec='seconds')}
+    _write_atomically(_entry_path(match_id(match_url)), json.dumps(entry).encode())
+    return entry
+
+
+def fetch_html(match_url, offline=None):
+    """Function that returns the HTML of a scorecard page. Cached pages are revalidated with PlayCricket.com the first
+    time they are requested in a run, and are then reused. If PlayCricket.com can't be reached, the cached page is used
+
+    :param match_url The URL of the scorecard on PlayCricket.com
+    :param offline If True, only the cache is used (defaults to the SCORECARD_OFFLINE environment variable)"""
+
+    match = match_id(match_url)
+    with _lock:
+        match_lock = _match_locks.setdefault(match, threading.Lock())
+
+    with match_lock:
+        entry = load_entry(match)
+
+        # Offline mode, and matches that have already been checked in this run
+        if offline if offline is not None else OFFLINE:
+            if entry is None:
+                raise Exception(f"The scorecard {match_url} isn't in the cache, and the cache is in offline mode")
+            return read_page(entry)
+        if entry is not None and match in _fresh:
+            return read_page(entry)
+
+        # Ask for the page only if it has changed since it was cached
+        headers = {}
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = requests.get(match_url, headers=headers, timeout=TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            print(f"\nCould not revalidate {match_url} ({e}), so the cached copy will be used")
+            return read_page(entry)
+
+        if response.status_code == 304 and entry is not None:
+            html = read_page(entry)
+        else:
+            html = response.text
+            store_page(match_url, html, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+        _fresh.add(match)
+        return html
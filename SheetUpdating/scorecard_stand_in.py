@@ -0,0 +1,147 @@
+"""Script that runs a local HTTP stand-in for PlayCricket.com, serving saved scorecard pages, and runs the pipelined
+updater against it. The scorecards are fetched through a fresh scorecard cache and the matches are written to
+FakeWorksheets built from the local mirror of the weekly sheets, so the concurrent fetching, the conditional requests
+(ETag/Last-Modified), the cleaning, the batched writes and the league table updates all run offline, without
+PlayCricket.com or Google Sheets. By default the saved pages are the ones in stand_in_pages, named by match ID, along
+with their match_results.json"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import formatdate
+import argparse
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import scorecard_cache
+import review_queue
+import pipeline
+from fake_worksheet import mirror_worksheet
+
+# The saved scorecard pages served by default, and the results of their matches
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stand_in_pages')
+
+
+def load_pages(pages_dir=PAGES_DIR):
+    """Function that returns a dictionary from each match ID to the HTML of its saved scorecard page. Pages are read from
+    the files named <match ID>.html in the given folder
+
+    :param pages_dir The folder holding the saved pages"""
+
+    pages = {}
+    for file_name in sorted(os.listdir(pages_dir)):
+        if file_name.endswith('.html'):
+            with open(os.path.join(pages_dir, file_name), encoding='utf-8') as f:
+                pages[file_name[:-len('.html')]] = f.read()
+    return pages
+
+
+def load_cached_pages(cache_dir=scorecard_cache.CACHE_DIR):
+    """Function that returns a dictionary from each match ID to the HTML of its scorecard page in the scorecard cache
+
+    :param cache_dir The scorecard cache folder (see scorecard_cache.py)"""
+
+    pages = {}
+    matches_dir = os.path.join(cache_dir, 'matches')
+    if not os.path.isdir(matches_dir):
+        return pages
+
+    for file_name in sorted(os.listdir(matches_dir)):
+        with open(os.path.join(matches_dir, file_name)) as f:
+            entry = json.load(f)
+        page_path = os.path.join(cache_dir, 'pages', f"{entry['sha256']}.html")
+        if os.path.exists(page_path):
+            with open(page_path, encoding='utf-8') as f:
+                pages[file_name[:-len('.json')]] = f.read()
+    return pages
+
+
+def start_stand_in(pages, port=0):
+    """Function that starts serving the given pages at http://127.0.0.1:port/website/results/<match ID>, in a daemon
+    thread. Pages are served with an ETag and a Last-Modified header, and conditional requests for an unchanged page
+    get a 304 response. Returns a tuple (server, base_url, requests), where requests is the list of (path, status) of
+    every request served
+
+    :param pages A dictionary from each match ID to the HTML of its page
+    :param port The port to listen on (0 picks a free port)"""
+
+    last_modified = formatdate(usegmt=True)
+    served = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = re.fullmatch(r"/website/results/(\d+)", self.path)
+            html = pages.get(match.group(1)) if match else None
+            if html is None:
+                served.append((self.path, 404))
+                self.send_error(404)
+                return
+
+            etag = f'"{hashlib.sha1(html.encode()).hexdigest()[:16]}"'
+            if self.headers.get('If-None-Match') == etag:
+                served.append((self.path, 304))
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            data = html.encode('utf-8')
+            served.append((self.path, 200))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, name='scorecard-stand-in', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/website/results/", served
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the updater offline, against a local stand-in for PlayCricket.com "
+                                                 "and fake weekly sheets")
+    parser.add_argument('--pages', default=PAGES_DIR, help="folder holding the saved pages, named <match ID>.html")
+    parser.add_argument('--from-cache', action='store_true', help="serve the pages in the scorecard cache instead")
+    parser.add_argument('--results', default=None,
+                        help="match results file (defaults to match_results.json in the pages folder)")
+    parser.add_argument('--week', type=int, default=1, help="week the matches are written to")
+    args = parser.parse_args()
+
+    pages = load_cached_pages() if args.from_cache else load_pages(args.pages)
+    if not pages:
+        raise Exception("No saved scorecard pages were found")
+    results_file = args.results or os.path.join(args.pages, 'match_results.json')
+    real_results = pipeline.load_results(results_file)
+    server, base_url, served = start_stand_in(pages)
+
+    # Fetch through an empty cache, so every page comes from the stand-in, and keep the review queue out of the real one
+    scorecard_cache.CACHE_DIR = tempfile.mkdtemp(prefix='scorecard_cache_')
+    review_queue.REVIEW_QUEUE_FILE = os.path.join(scorecard_cache.CACHE_DIR, 'review_queue.jsonl')
+
+    # Use the results of the real links for the stand-in's links
+    links = {match: base_url + match for match in pages}
+    results = {links[scorecard_cache.match_id(link)]: result for link, result in real_results.items()
+               if scorecard_cache.match_id(link) in links}
+
+    # Write to fake weekly sheets, and add each match to the league table built from the local mirror. The roster is
+    # read from week 1
+    worksheets = {week: mirror_worksheet(week) for week in {1, args.week}}
+    standings = pipeline.load_standings()
+    skipped = pipeline.run_updates({args.week: list(links.values())}, results, worksheets=worksheets,
+                                   standings=standings)
+    server.shutdown()
+
+    # Each match written should have cost one request
+    written = len(links) - len(skipped)
+    requests = len(worksheets[args.week].requests)
+    if requests != written:
+        raise Exception(f"{written} matches were written with {requests} requests instead of one request each")
+    print(f"\n{standings.league_table_df().head(5).to_string(index=False)}")
+    print(f"\nThe stand-in served {len(served)} requests for {len(pages)} saved pages, and {written} matches were "
+          f"written to the fake Week{args.week} sheet with {requests} requests ({len(skipped)} skipped)")
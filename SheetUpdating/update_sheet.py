@@ -2,19 +2,23 @@ import write_google_sheets, read_play_cricket
 
 """This file contains the function that will be used to update the Google Sheet"""
 
-def update_sheets(scorecard_link, week_number):
+def update_sheets(scorecard_link, week_number, warwick_win=False, motm=None, dry_run=False):
     """Function that updates the spreadsheet corresponding to the parameter week_number with the stats from the link scorecard_link
     
     :param scorecard_link The link (as a string) to the PlayCricket scorecard that we will use to update the sheet
-    :param week_number The week number corresponding to the sheet we want to update (e.g 5 would update the Week5 Sheet)"""
+    :param week_number The week number corresponding to the sheet we want to update (e.g 5 would update the Week5 Sheet)
+    :param warwick_win True if Warwick won the match (used to give bonus points)
+    :param motm The name of the Man of the Match, or None if there wasn't one
+    :param dry_run If True, the planned writes are printed instead of being sent to the sheet"""
 
     # Get the batting, bowling and fielding data
     print(f"\nFetching data for the game {scorecard_link} from PlayCricket.com\n")
-    bat_df, bowl_df, field_df = read_play_cricket.clean_scorecards(scorecard_link)
+    bat_df, bowl_df, field_df = read_play_cricket.clean_scorecards(scorecard_link, write_google_sheets.get_sheet_names(week_number))
     print(f"'\nFinished collecting data for the game {scorecard_link} from PlayCricket\n")
 
     # Update the relevant sheet using the data
-    write_google_sheets.update_stats(bat_df, bowl_df, field_df, week_number)
+    write_google_sheets.update_stats(bat_df, bowl_df, field_df, week_number, warwick_win, motm,
+                                     match_url=scorecard_link, dry_run=dry_run)
     print(f"\nFinished updating the Week{week_number} sheet with data from {scorecard_link}\n")
 
 if __name__ == "__main__":
@@ -24,6 +28,10 @@ if __name__ == "__main__":
     # Week number to update (Change it to the week you want to update)
     week_number = 1
 
+    # Whether Warwick won, and the Man of the Match as their name appears on the sheet (or None)
+    warwick_win = False
+    motm = None
+
     # Update the sheet  
-    update_sheets(scorecard_link, week_number)
+    update_sheets(scorecard_link, week_number, warwick_win, motm)
    
\ No newline at end of file
@@ -1,59 +1,129 @@
 """Module containing functions to write data from Dataframes into Google Sheets"""
 
-import read_play_cricket
-import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import name_resolver
+import review_queue
+import sys
+import os
+from gspread.utils import rowcol_to_a1
+
+# The shared Sheets client lives in the top level of the repository, alongside the web app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sheets_client
 
 
 def get_sheet():
-    """Function that returns the Google Sheet 'WarwickFantasyCricketPlayerStats'."""
+    """Function that returns the Google Sheet 'WarwickFantasyCricketPlayerStats'. The authorised client and the opened
+    sheet are shared, so calling this for every match doesn't re-authenticate."""
+
+    return sheets_client.open_spreadsheet(sheets_client.STATS_SPREADSHEET)
+
+
+def get_week_sheet(week_number):
+    """Function that returns the worksheet of a particular week on the Google Sheet
+
+    :param week_number The Week Number of the sheet
+    """
+
+    return sheets_client.get_worksheet(sheets_client.STATS_SPREADSHEET, week_number - 1)
 
-    # Define the scope of the application
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/spreadsheets',
-             'https://www.googleapis.com/auth/drive.file', 'https://www.googleapis.com/auth/drive']
 
-    # Add credentials to the account
-    creds = ServiceAccountCredentials.from_json_keyfile_name('google-credentials.json', scope)
+def get_sheet_names(week_number=1, worksheet=None):
+    """Function that returns the list of player names on the sheet of a particular week. Every weekly sheet lists the
+    same players, so this is also the roster used to identify Warwick's scorecards.
 
-    # Authorise the client sheet
-    client = gspread.authorize(creds)
+    :param week_number The Week Number of the sheet to read the names from
+    :param worksheet The worksheet to read the names from instead of the Google Sheet (e.g. a FakeWorksheet)
+    """
 
-    # Get the sheet
-    sheet = client.open('WarwickFantasyCricketPlayerStats')
-    return sheet
+    sheet = get_week_sheet(week_number) if worksheet is None else worksheet
+    return sheet.col_values(2)[2:]
 
 
-def update_stats(bat_df, bowl_df, field_df, week_number):
-    """Function that updates the sheet of a particular week
+def update_stats(bat_df, bowl_df, field_df, week_number, warwick_win=False, motm=None, match_url=None, dry_run=False,
+                 worksheet=None):
+    """Function that updates the sheet of a particular week. Every cell for the match is collected first and then written
+    with a single batch update, so each match costs one write request. Returns the list of planned writes. If any name
+    can't be matched to the sheet, the names are added to the review queue, nothing is written and NeedsReview is raised
 
     :param bat_df The cleaned batting dataframe, obtained from the function read_play_cricket.clean_scorecards()
     :param bowl_df The cleaned bowling dataframe, obtained from the function read_play_cricket.clean_scorecards()
     :param field_df The cleaned fielding dataframe, obtained from the function read_play_cricket.clean_scorecards()
     :param week_number The Week Number of the sheet to be updated.
+    :param warwick_win True if Warwick won the match (used to give bonus points)
+    :param motm The name of the Man of the Match, or None if there wasn't one
+    :param match_url The URL of the scorecard, recorded in the review queue
+    :param dry_run If True, the planned writes are printed instead of being sent to the sheet
+    :param worksheet The worksheet to update instead of the Google Sheet (e.g. a FakeWorksheet)
     """
 
     # Get the relevant sheet instance and list of names on sheet
-    sheet = get_sheet().get_worksheet(week_number - 1)
+    sheet = get_week_sheet(week_number) if worksheet is None else worksheet
     sheet_names = sheet.col_values(2)[2:]
 
-    # Get the winning team from the user. This will be used to add bonus winning points if Warwick won
-    warwick_win = input('Did Warwick win? (This will be used to give bonus points if they won). Type "y" or "n" and '
-                        'then press enter')
+    # Build every write for the match
+    updates, unresolved = plan_stats_update(bat_df, bowl_df, field_df, sheet_names, warwick_win, motm)
+
+    # Leave the whole match for review rather than writing part of it
+    if unresolved:
+        review_queue.add('names', match_url, week=week_number,
+                         names={x: name_resolver.suggestions(x, sheet_names) for x in unresolved})
+        raise review_queue.NeedsReview(f"These names were not found on the Week{week_number} sheet: {unresolved}")
+
+    # Print the planned writes in a dry run, otherwise send them to the sheet in one request
+    if dry_run:
+        print(f"Dry run: {len(updates)} ranges would be written to the Week{week_number} sheet in 1 request")
+        for update in updates:
+            print(f"  {update['range']}: {update['values'][0]}")
+    else:
+        sheet.batch_update(updates)
+        print(f"{len(updates)} ranges have been successfully written to the Week{week_number} sheet \n")
+
+    return updates
+
+
+def plan_stats_update(bat_df, bowl_df, field_df, sheet_names, warwick_win, motm):
+    """Function that returns a tuple (updates, unresolved). updates is the list of writes needed to put a match's stats on
+    a weekly sheet, where each write is a dictionary of the form {'range': 'D5:L5', 'values': [[...]]}, as expected by
+    gspread's Worksheet.batch_update. unresolved is the list of names that couldn't be matched to the sheet, which are
+    left out of the writes
 
-    # Get the MOTM and update the sheet with it
-    motm = man_of_the_match(sheet_names)
-    motm_index = name_to_index(motm, sheet_names)
-    sheet.update_cell(motm_index, 24, 1)
+    :param bat_df The cleaned batting dataframe, obtained from the function read_play_cricket.clean_scorecards()
+    :param bowl_df The cleaned bowling dataframe, obtained from the function read_play_cricket.clean_scorecards()
+    :param field_df The cleaned fielding dataframe, obtained from the function read_play_cricket.clean_scorecards()
+    :param sheet_names The list of names on the weekly sheet
+    :param warwick_win True if Warwick won the match (used to give bonus points)
+    :param motm The name of the Man of the Match, or None if there wasn't one
+    """
+
+    updates = []
+    unresolved = []
+    aliases = name_resolver.load_aliases()
+
+    def add_update(row, first_col, values):
+        # Skip players whose names couldn't be matched
+        if row is None:
+            return
+        cell_range = f"{rowcol_to_a1(row, first_col)}:{rowcol_to_a1(row, first_col + len(values) - 1)}"
+        updates.append({'range': cell_range, 'values': [values]})
+
+    def find_row(name):
+        row = name_to_index(name, sheet_names, aliases)
+        if row is None and name not in unresolved:
+            unresolved.append(name)
+        return row
+
+    # Add the MOTM
+    if motm is not None:
+        add_update(find_row(motm), 24, [1])
 
     # Get the list of names from the batting Dataframe
     batsman_list = list(bat_df['BATSMAN'])
 
-    # For loop to update each player's batting stats
+    # For loop to add each player's batting stats
     for name in batsman_list:
 
         # Get the index of this name in the sheet
-        name_row_index = name_to_index(name, sheet_names)
+        name_row_index = find_row(name)
 
         # Get batting stats from dataframe
         batsman_index = batsman_list.index(name)
@@ -95,29 +165,21 @@ def update_stats(bat_df, bowl_df, field_df, week_number):
             fifties = 0
             ducks = 0
 
-        # Create list of batting stats and update the spreadsheet
+        # Add the list of batting stats
         batting_stats = [1, runs, fours, sixes, fifties, hundreds, hundred_and_fifties, double_hundreds, ducks]
-        batting_cells = sheet.range(name_row_index, 4, name_row_index, 12)
-        for i, val in enumerate(batting_stats):
-            batting_cells[i].value = val
-        sheet.update_cells(batting_cells)
-
-        print(name + "'s batting stats have been successfully updated \n")
+        add_update(name_row_index, 4, batting_stats)
 
-        # Update the spreasheet if Warwick won for bonus points
-        if warwick_win.strip() == 'y':
-            sheet.update_cell(name_row_index, 25, 1)
-        else:
-            sheet.update_cell(name_row_index, 25, 0)
+        # Add the win bonus
+        add_update(name_row_index, 25, [1 if warwick_win else 0])
 
     # Get list of names from bowling dataframe
     bowler_list = list(bowl_df['BOWLER'])
 
-    # For loop to update each player's bowling stats
+    # For loop to add each player's bowling stats
     for name in bowler_list:
 
         # Get the index of the name in the sheet
-        name_row_index = name_to_index(name, sheet_names)
+        name_row_index = find_row(name)
 
         # Get bowling stats from dataframe
         bowler_index = bowler_list.index(name)
@@ -147,14 +209,9 @@ def update_stats(bat_df, bowl_df, field_df, week_number):
             five = 0
             three_four = 0
 
-        # Create list of bowling stats and update the spreadsheet.
+        # Add the list of bowling stats
         bowling_stats = [float(overs), balls, wickets, runs_against, maidens, three_four, five, six_plus]
-        bowling_cells = sheet.range(name_row_index, 13, name_row_index, 20)
-        for i, val in enumerate(bowling_stats):
-            bowling_cells[i].value = val
-        sheet.update_cells(bowling_cells)
-
-        print(name + "'s bowling stats have been successfully updated \n")
+        add_update(name_row_index, 13, bowling_stats)
 
     # Case where fielding dataframe is empty
     if field_df.empty:
@@ -166,11 +223,11 @@ def update_stats(bat_df, bowl_df, field_df, week_number):
         # Get list of names from fielding dataframe
         fielder_list = list(field_df['Fielder'])
 
-        # For loop to update each player's fielding stats
+        # For loop to add each player's fielding stats
         for name in fielder_list:
 
             # Get the index of the name in the sheet.
-            name_row_index = name_to_index(name, sheet_names)
+            name_row_index = find_row(name)
 
             # Get fielding stats from dataframe
             fielder_index = fielder_list.index(name)
@@ -180,14 +237,11 @@ def update_stats(bat_df, bowl_df, field_df, week_number):
             run_outs = int(field_df.at[fielder_index, 'Run-outs'])
             stumpings = int(field_df.at[fielder_index, 'Stumpings'])
 
-            # Create list of fielding stats and update the spreadsheet
+            # Add the list of fielding stats
             fielding_stats = [catches, run_outs, stumpings]
-            fielding_cells = sheet.range(name_row_index, 21, name_row_index, 23)
-            for i, val in enumerate(fielding_stats):
-                fielding_cells[i].value = val
-            sheet.update_cells(fielding_cells)
+            add_update(name_row_index, 21, fielding_stats)
 
-            print(name + "'s fielding stats have been successfully updated \n")
+    return updates, unresolved
 
 
 def overs_to_balls(overs):
@@ -212,46 +266,16 @@ def overs_to_balls(overs):
     return balls
 
 
-def name_to_index(name, sheet_names):
-    """Function that checks if a given name is in a given list of names from the Google Sheet. Returns
-    the index of the name in the sheet if it is found, prompts user input otherwise until the names match.
+def name_to_index(name, sheet_names, aliases=None):
+    """Function that returns the row index in the sheet of the player a scorecard name refers to, or None if the name
+    can't be matched to exactly one player on the sheet.
     :param name The name to check against the list of names in the sheet
-    :param sheet_names The list of names of the WarwickFantasyCricketPlayerStats Sheet"""
+    :param sheet_names The list of names of the WarwickFantasyCricketPlayerStats Sheet
+    :param aliases A dictionary from scorecard names to sheet names (defaults to the aliases file)"""
 
-    # Case where names match
-    if name in sheet_names:
-        # Row index of the name in the sheet
-        name_row_index = sheet_names.index(name) + 3
-        return name_row_index
-
-    # Case where names don't match
-    else:
-        valid_name = False
-        while not valid_name:
-            # Prompt user input
-            print('The name "' + name + '" was not found on the sheet.')
-            user_input = input('Please type the correct name, as it appears in the sheet.').strip()
-
-            # Check if user input is valid. If it is, update the sheet
-            if user_input in sheet_names:
-                name_row_index = sheet_names.index(user_input) + 3
-                return name_row_index
-            else:
-                print("Your input was not found on the sheet. Please try again \n")
-
-
-def man_of_the_match(sheet_names):
-    """Function that requests user input for man of the match and returns the name of the person on the sheet who
-     is man of the match for a particular game
-
-     :param sheet_names The list of names on the spreadhseet to check the user input against"""
-
-    valid_name = False
-    while not valid_name:
-        print('Please type in the Man of the Match, as their name appears on the spreadsheet. \n')
-        user_input = input().strip()
-        if user_input in sheet_names:
-            return user_input
-        else:
-            print('The name "' + user_input + '"' + ' was not found in the sheet. Please try again')
+    sheet_name = name_resolver.resolve_name(name, sheet_names, aliases)
+    if sheet_name is None:
+        return None
 
+    # Row index of the name in the sheet
+    return sheet_names.index(sheet_name) + 3
@@ -0,0 +1,223 @@
+"""Module containing the read-only JSON API, served under /api/v1. Every response is built from the structures derived
+once per version of the sheets (the team analytics, standings history, season store, roster index and dream teams),
+and is serialised and compressed only once per version by json_cache.cached_json. Team and player names in the urls
+have dashes instead of spaces, the same as the pages"""
+
+from flask import Blueprint, abort
+import sheet_cache
+from json_cache import cached_json
+from player_registry import get_player_registry
+from roster_index import get_roster_index, ROSTER_SLOTS
+from season_store import get_season_store, CATEGORY_COLUMNS
+from dream_team_engine import get_dream_teams
+from team_analytics import get_team_analytics
+from standings_history import get_standings_history
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+###-------------------------------------------------------------
+# Utility functions
+###-------------------------------------------------------------
+
+def _team_name(key):
+    """Returns the team name in the given url key, or aborts with a 404 if the team isn't on the TeamList
+
+    :param key The team name from the url"""
+
+    team_name = key.replace('-', ' ')
+    if team_name not in get_team_analytics().team_index_by_name:
+        abort(404)
+    return team_name
+
+
+def _player(key):
+    """Returns a tuple (player_name, player_number) of the player in the given url key, or aborts with a 404 if the
+    player isn't on the TotalStats sheet. Players are resolved through the player registry, since the weekly sheets
+    don't always spell names the same way as TotalStats
+
+    :param key The player name from the url"""
+
+    # Names that contain a dash (e.g. double-barrelled surnames) only match on their url form
+    registry = get_player_registry()
+    player_name = key.replace('-', ' ')
+    if player_name not in registry:
+        player_name = {x.strip().replace(' ', '-'): x for x in registry.name_to_number}.get(key)
+        if player_name is None:
+            abort(404)
+    return player_name, registry.number(player_name)
+
+
+def _dream_team(df):
+    """Returns the given dream team dataframe as a list of dictionaries, or None if there is no dream team
+
+    :param df The dream team dataframe (from dream_team_engine.DreamTeams.team())"""
+
+    if df is None:
+        return None
+    return [{'name': name, 'role': role, 'points': points}
+            for name, role, points in zip(df['NAME'].tolist(), df['ROLE'].tolist(), df['POINTS'].tolist())]
+
+
+###-------------------------------------------------------------
+# League and standings
+###-------------------------------------------------------------
+
+@api.route('/league')
+@cached_json
+def league():
+    # The league table, in descending order of total points
+    history = get_standings_history()
+    team_list = sheet_cache.get_sheet('TeamList')
+    totals = team_list['Total Points'].to_numpy()
+    order = (-totals).argsort(kind='stable')
+    return [{'position': i + 1,
+             'team': history.team_names[team],
+             'owner': history.team_owners[team],
+             'points': totals[team]} for i, team in enumerate(order.tolist())]
+
+
+@api.route('/standings/history')
+@cached_json
+def standings_history():
+    # Every team's weekly points, cumulative points and league position after each week
+    return get_standings_history().to_dict()
+
+
+@api.route('/standings/history/<team>')
+@cached_json
+def team_standings_history(team):
+    return get_standings_history().team_history(_team_name(team))
+
+
+@api.route('/standings/head-to-head/<team_a>/<team_b>')
+@cached_json
+def head_to_head(team_a, team_b):
+    return get_standings_history().head_to_head(_team_name(team_a), _team_name(team_b))
+
+
+###-------------------------------------------------------------
+# Teams
+###-------------------------------------------------------------
+
+@api.route('/teams')
+@cached_json
+def teams():
+    # Every team in alphabetical order
+    history = get_standings_history()
+    return sorted(({'team': name, 'owner': owner} for name, owner in zip(history.team_names, history.team_owners)),
+                  key=lambda x: x['team'])
+
+
+@api.route('/teams/<team>')
+@cached_json
+def team(team):
+    # The team's roster, with each player's weekly points, and the team's weekly points
+    analytics = get_team_analytics()
+    history = get_standings_history()
+    index = analytics.team_index(_team_name(team))
+    roster = [{'slot': slot, 'number': number, 'name': name, 'points': points}
+              for slot, number, name, points in zip(ROSTER_SLOTS, analytics.roster_numbers[index].tolist(),
+                                                    analytics.roster_names[index].tolist(),
+                                                    analytics.points[index].tolist())]
+    return {'team': analytics.team_names[index],
+            'owner': history.team_owners[index],
+            'weeks': analytics.weeks,
+            'points': analytics.week_points[index].tolist(),
+            'total': float(analytics.week_points[index].sum()),
+            'roster': roster}
+
+
+###-------------------------------------------------------------
+# Players
+###-------------------------------------------------------------
+
+@api.route('/players')
+@cached_json
+def players():
+    # Every player on the PlayerList in alphabetical order, along with their squad, role and price
+    player_list = sheet_cache.get_sheet('PlayerList').sort_values('Player Name')
+    return [{'name': name, 'squad': squad, 'role': role, 'price': price}
+            for name, squad, role, price in zip(player_list['Player Name'].tolist(), player_list['Squad'].tolist(),
+                                                player_list['Role'].tolist(), player_list['Price (M)'].tolist())]
+
+
+@api.route('/players/<player>')
+@cached_json
+def player(player):
+    # The player's season points by category and the number of teams that picked them
+    registry = get_player_registry()
+    store = get_season_store()
+    player_name, player_number = _player(player)
+    season_points = store.player(player_number)[:, store.stat_index(CATEGORY_COLUMNS + ['TOTAL'])].sum(axis=0)
+    return {'name': player_name,
+            'number': player_number,
+            'role': registry.player_roles[registry.row(player_name)],
+            'points': dict(zip([x.lower() for x in CATEGORY_COLUMNS + ['TOTAL']], season_points.tolist())),
+            'picks': get_roster_index().pick_count(player_number)}
+
+
+@api.route('/players/<player>/points')
+@cached_json
+def player_points(player):
+    # The player's weekly points in each category
+    store = get_season_store()
+    player_name, player_number = _player(player)
+    weekly_points = store.player(player_number)[:, store.stat_index(CATEGORY_COLUMNS + ['TOTAL'])].T
+    return {'name': player_name,
+            'weeks': store.weeks,
+            'points': dict(zip([x.lower() for x in CATEGORY_COLUMNS + ['TOTAL']], weekly_points.tolist()))}
+
+
+@api.route('/players/<player>/picks')
+@cached_json
+def player_picks(player):
+    # The teams that picked the player, and the slot they picked them in
+    player_name, player_number = _player(player)
+    picks = get_roster_index().picks(player_number)
+    return {'name': player_name,
+            'picks': [{'team': team_name, 'owner': team_owner, 'slot': slot} for team_name, team_owner, slot in picks]}
+
+
+@api.route('/picks')
+@cached_json
+def picks():
+    # Every picked player in descending order of picks
+    registry = get_player_registry()
+    most_picked = get_roster_index().most_picked()
+    numbers = [number for number, _ in most_picked]
+    return [{'name': name, 'number': number, 'role': role, 'picks': count}
+            for name, number, role, (_, count) in zip(registry.names(numbers), numbers,
+                                                      registry.player_roles[registry.rows(numbers)].tolist(),
+                                                      most_picked)]
+
+
+###-------------------------------------------------------------
+# Dream teams
+###-------------------------------------------------------------
+
+@api.route('/dream-teams')
+@cached_json
+def dream_teams():
+    # The dream team on total points, and the dream team of each week that has one
+    dream_teams = get_dream_teams()
+    return {'current': _dream_team(dream_teams.team('TotalStats')),
+            'weeks': {str(x): _dream_team(dream_teams.team(f"Week{x}")) for x in dream_teams.active_weeks()}}
+
+
+if __name__ == "__main__":
+    from app import app
+
+    # Check every player on the TotalStats sheet resolves through each player endpoint
+    client = app.test_client()
+    failures = []
+    for player_name in get_player_registry().player_names.tolist():
+        key = player_name.strip().replace(' ', '-')
+        for url in [f"/api/v1/players/{key}", f"/api/v1/players/{key}/points", f"/api/v1/players/{key}/picks"]:
+            status = client.get(url).status_code
+            if status != 200:
+                failures.append((url, status))
+
+    for url, status in failures:
+        print(f"{url} returned {status}")
+    print(f"Checked {len(get_player_registry())} players, {len(failures)} failures")
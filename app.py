@@ -1,14 +1,29 @@
-from flask import Flask, render_template
-from table_data_manager import generate_table_sheet, generate_league_table_df, generate_team_roster_table, generate_dream_team_table, get_sheet_df, generate_table, team_to_owner, generate_picks_table, name_to_picks, generate_points_calculator_table, generate_teams_table, generate_players_table
-from graph_manager import team_points_df, team_points_stacked_bar_graph, team_points_stacked_line_graph, top_n_league_graph, role_pie_chart, mvp_radar_graph, team_roster_radar_graph, player_points_df, player_points_bar_graph, player_points_line_graph, player_points_radar_graph, team_players_breakdown_df
-
-import gspread
-import pandas as pd
-from oauth2client.service_account import ServiceAccountCredentials
+from flask import Flask, render_template, send_from_directory, request, url_for, abort, Response
+from table_data_manager import generate_league_table_df, generate_team_roster_table, generate_dream_team_tables, get_sheet_df, generate_table, team_to_owner, generate_picks_table, name_to_picks, generate_points_calculator_table, generate_teams_table, generate_players_table, generate_most_picked_table
+from graph_manager import team_points_stacked_bar_graph, team_points_stacked_line_graph, top_n_league_graph, league_position_graph, role_pie_chart, mvp_radar_graph, team_roster_radar_graph, player_points_df, player_points_bar_graph, player_points_line_graph, player_points_radar_graph, team_players_breakdown_df
+
+from page_cache import cached_page
+from static_site import serve_prebuilt
+from api import api
+from team_analytics import get_team_analytics
+from player_registry import get_player_registry
+import data_sync
+import data_versions
+import sheets_client
+import hashlib
 import os
 
 app = Flask(__name__)
 
+# Pin each request to the version of the data being served, and switch to new versions as they are published
+data_versions.init_app(app)
+
+# Serve pages pre-rendered by static_site.py when they are up to date
+serve_prebuilt(app)
+
+# JSON API under /api/v1
+app.register_blueprint(api)
+
 
 # -------------------------------------------------------------------------------
 @app.route('/favicon.ico')
@@ -16,26 +31,107 @@ def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static'),
                                'images/favicon.ico', mimetype='image/vnd.microsoft.icon')
 
+# -------------------------------------------------------------------------------
+# Charts are served from their own urls so that browsers and proxies can cache them separately from the pages. Each
+# kind of chart is drawn from a key, which is 'all' for the home page charts, n for the top n tracker and positions,
+# and the team or player name (with dashes instead of spaces) for the team and player charts
+
+def _display_name(key):
+    return key.replace('-', ' ')
+
+# The sizes of the top n tracker and positions charts that can be drawn. Any other n is a 404, so the chart cache can't
+# be filled with charts nobody links to
+TRACKER_SIZES = ['5']
+
+def _is_team(key):
+    return _display_name(key) in get_team_analytics().team_index_by_name
+
+def _is_player(key):
+    return _display_name(key) in get_player_registry()
+
+# Checks that a key names something a chart can be drawn for, made before anything is drawn
+CHART_KEYS = {
+    'league-tracker': lambda key: key in TRACKER_SIZES,
+    'league-positions': lambda key: key in TRACKER_SIZES,
+    'role-pie': lambda key: key == 'all',
+    'mvp-radar': lambda key: key == 'all',
+    'team-points-bar': _is_team,
+    'team-points-line': _is_team,
+    'team-roster-radar': _is_team,
+    'player-points-bar': _is_player,
+    'player-points-line': _is_player,
+    'player-points-radar': _is_player,
+}
+
+CHARTS = {
+    'league-tracker': lambda key: top_n_league_graph(int(key), generate_league_table_df()),
+    'league-positions': lambda key: league_position_graph(int(key), generate_league_table_df()),
+    'role-pie': lambda key: role_pie_chart(get_sheet_df('TotalStats')),
+    'mvp-radar': lambda key: mvp_radar_graph(get_sheet_df('TotalStats')),
+    'team-points-bar': lambda key: team_points_stacked_bar_graph(_display_name(key), team_players_breakdown_df(_display_name(key))),
+    'team-points-line': lambda key: team_points_stacked_line_graph(_display_name(key), team_players_breakdown_df(_display_name(key))),
+    'team-roster-radar': lambda key: team_roster_radar_graph(_display_name(key)),
+    'player-points-bar': lambda key: player_points_bar_graph(_display_name(key), player_points_df(_display_name(key))),
+    'player-points-line': lambda key: player_points_line_graph(_display_name(key), player_points_df(_display_name(key))),
+    'player-points-radar': lambda key: player_points_radar_graph(_display_name(key), player_points_df(_display_name(key))),
+}
+
+def chart_hash(svg):
+    """Returns the content hash of a rendered chart, used to version its url
+
+    :param svg The rendered chart"""
+    return hashlib.sha1(svg.encode()).hexdigest()[:16]
+
+def chart_url(kind, key):
+    """Returns the url of the given chart, including its content hash so the url changes whenever the chart does
+
+    :param kind The kind of chart (one of the keys of CHARTS)
+    :param key The key the chart is drawn from"""
+
+    # The graph functions are cached, so drawing the chart here means the chart endpoint won't draw it again
+    svg = CHARTS[kind](key)
+    return url_for('chart', kind=kind, key=key, v=chart_hash(svg))
+
+@app.route("/charts/<kind>/<key>.svg")
+def chart(kind, key):
+    if kind not in CHARTS or not CHART_KEYS[kind](key):
+        abort(404)
+    svg = CHARTS[kind](key)
+
+    # Urls with the current content hash never change, so they can be cached for a year. Anything else is revalidated
+    response = Response(svg, mimetype='image/svg+xml')
+    content_hash = chart_hash(svg)
+    response.set_etag(content_hash)
+    response.cache_control.public = True
+    if request.args.get('v') == content_hash:
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 # -------------------------------------------------------------------------------
 @app.route("/")
+@cached_page
 def home():
     # Dataframes
     table_df = generate_league_table_df()
-    total_stats_df = get_sheet_df('TotalStats')
     
     # Generate tables
     league_table = generate_table(table_df, link_columns=[("Team Name", "teams")])
-    dream_team = generate_dream_team_table(total_stats_df)
+    dream_team = generate_dream_team_tables()[0]
     
-    # Generate graphs
-    tracker_graph = top_n_league_graph(5, table_df)
-    pie_chart = role_pie_chart(total_stats_df)
-    radar_graph = mvp_radar_graph(total_stats_df)
+    # Get the graph urls
+    tracker_graph = chart_url('league-tracker', 5)
+    positions_graph = chart_url('league-positions', 5)
+    pie_chart = chart_url('role-pie', 'all')
+    radar_graph = chart_url('mvp-radar', 'all')
 
-    return render_template("index.html", league_table=league_table, dream_team=dream_team, tracker_graph=tracker_graph, role_pie_chart=pie_chart, mvp_radar_graph=radar_graph)
+    return render_template("index.html", league_table=league_table, dream_team=dream_team, tracker_graph=tracker_graph, positions_graph=positions_graph, role_pie_chart=pie_chart, mvp_radar_graph=radar_graph)
 
 
 @app.route("/about")
+@cached_page
 def about():
     
     # Generate the points calculator table
@@ -45,36 +141,17 @@ def about():
 
 
 @app.route("/dream-teams")
+@cached_page
 def dream_teams():
     
-    # Generate current dream team table
-    total_stats = get_sheet_df("TotalStats")
-    current_team = generate_dream_team_table(total_stats)
-
-    # Get a list of the weeks that we will generate the dream team tables for
-    week_names = []
-    week_nums = []
-    for i in range(0, 10):
-        # Get sheet for the week
-        sheet_name = f'Week{i+1}'
-        week_df = get_sheet_df(sheet_name)
-
-        # Check degeneracy
-        if generate_dream_team_table(week_df) == "":
-            continue
-        else:
-            week_names.append(f"Week{i+1}")
-            week_nums.append(i+1)
-    
-    # Generate tables and store in a list
-    weekly_teams = []
-    for week_name in week_names:
-        weekly_teams.append(generate_dream_team_table(get_sheet_df(week_name)))
+    # Generate the current dream team table and the tables of the weeks that have a dream team
+    current_team, week_nums, weekly_teams = generate_dream_team_tables()
 
     return render_template("dream-teams.html", current_team=current_team, week_nums=week_nums, weekly_teams=weekly_teams)
 
 
 @app.route("/teams")
+@cached_page
 def teams():
     
     # Get TeamList dataframe
@@ -86,13 +163,13 @@ def teams():
     return render_template("teams.html", teams_table=teams_table)
 
 @app.route("/teams/<name>")
+@cached_page
 def team_stats(name):
     # Remove dash in team name for display purposes
     team_name = name.replace('-', ' ')
 
-    # Get the TeamList and TotalStats sheets as dataframes
+    # Get the TeamList sheet as a dataframe
     team_list = get_sheet_df("TeamList")
-    total_stats = get_sheet_df("TotalStats")
 
     # Get the team owner
     team_owner = team_to_owner(team_name, team_list)
@@ -100,15 +177,14 @@ def team_stats(name):
     # Generate the team roster table
     team_roster = generate_team_roster_table(team_name, team_list)
 
-    # Generate the weekly points bar graph for the team
-    breakdown_df = team_players_breakdown_df(team_name, team_list)
-    bar_graph = team_points_stacked_bar_graph(team_name, breakdown_df)
+    # Get the url of the weekly points bar graph for the team
+    bar_graph = chart_url('team-points-bar', name)
 
-    # Generate the weekly points cumulative line graph for the team
-    line_graph = team_points_stacked_line_graph(team_name, breakdown_df)
+    # Get the url of the weekly points cumulative line graph for the team
+    line_graph = chart_url('team-points-line', name)
 
-    # Generate the team roster radar graph
-    radar_graph = team_roster_radar_graph(team_name, team_list, total_stats)
+    # Get the url of the team roster radar graph
+    radar_graph = chart_url('team-roster-radar', name)
 
 
     return render_template("team-stats.html", team_name=team_name, team_owner=team_owner, 
@@ -117,6 +193,7 @@ def team_stats(name):
 
 
 @app.route("/players")
+@cached_page
 def players():
 
     # Get PlayerList Sheet
@@ -125,36 +202,29 @@ def players():
     # Generate player list table
     players_table = generate_players_table(player_list)
 
-    return render_template("players.html", players_table=players_table)
+    # Generate the most picked players table
+    most_picked_table = generate_most_picked_table(10)
+
+    return render_template("players.html", players_table=players_table, most_picked_table=most_picked_table)
 
 @app.route("/players/<name>")
+@cached_page
 def player_stats(name):
     # Remove dash in player name for display purposes
     player_name = name.replace('-', ' ')
 
-    # Get the TeamList sheet as a dataframe
-    team_list = get_sheet_df('TeamList')
-
-    # Get the weekly sheets and TotalStats sheet as dataframes
-    weekly_dfs = [get_sheet_df('Week1'), get_sheet_df('Week2'), get_sheet_df('Week3'), get_sheet_df('Week4'),
-                get_sheet_df('Week5'), get_sheet_df('Week6'), get_sheet_df('Week7'), get_sheet_df('Week8'), get_sheet_df('Week9'),
-                get_sheet_df('Week10'), get_sheet_df('TotalStats')]
+    # Get the url of the player points bar graph
+    bar_graph = chart_url('player-points-bar', name)
 
-    # Get the player points dataframes
-    player_points = player_points_df(player_name, weekly_dfs)
+    # Get the url of the player points cumulative line graph
+    line_graph = chart_url('player-points-line', name)
 
-    # Generate the player points bar graph
-    bar_graph = player_points_bar_graph(player_name, player_points)
-
-    # Generate the player points cumulative line graph
-    line_graph = player_points_line_graph(player_name, player_points)
-
-    # Generate the player points radar graph
-    radar_graph = player_points_radar_graph(player_name, player_points)
+    # Get the url of the player points radar graph
+    radar_graph = chart_url('player-points-radar', name)
 
     # Generate the picks table and get the total picks
-    picks_table = generate_picks_table(player_name, team_list)
-    total_picks = name_to_picks(player_name, team_list)[1]
+    picks_table = generate_picks_table(player_name)
+    total_picks = name_to_picks(player_name)[1]
 
     return render_template("player-stats.html", player_name=player_name, 
                             bar_graph=bar_graph, line_graph=line_graph,
@@ -162,49 +232,22 @@ def player_stats(name):
 
 
 def initialize():
-    # check if the data folder is empty
-    if not os.listdir("data"):
-        print("Downloading sheets from google sheets")
-        sheet_names = ["Week1", "Week2", "Week3", "Week4", "Week5", "Week6", "Week7",
-                    "Week8", "Week9", "Week10", "TotalStats", "TeamList"]
-
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive.file', 'https://www.googleapis.com/auth/drive']
-
-        # Add credentials to the account
-        creds = ServiceAccountCredentials.from_json_keyfile_name('google-credentials.json', scope)
-
-        # Authorise the client sheet
-        client = gspread.authorize(creds)
-
-        # Get the stats spreadsheets
-        sheet = client.open("WarwickFantasyCricketPlayerStats")
-
-        for i, sheet_name in enumerate(sheet_names):
-            spreadsheet = sheet.get_worksheet(i)
-            sheet_range = 'A2:AD200' if sheet_name != "TeamList" else 'A1:AD200'
-            records_data = spreadsheet.get(sheet_range)
-            df = pd.DataFrame.from_dict(records_data)
-            df.columns = [x.strip() for x in df.iloc[0]]
-            df = df[1:]
-            df.to_csv(os.path.join('data', f'{sheet_name}.csv'), index=False)
-        
-        # Get the FantasyCricketTeamSelection spreadsheet
-        team_selection_sheet = client.open('WarwickFantasyCricketTeamSelection')
-        player_list = team_selection_sheet.get_worksheet(0)
-
-        # Trim the FantasyCricketTeamSelection spreadsheet
-        sheet_range = 'B2:E200'
-        records_data = player_list.get(sheet_range)
-
-        # Convert sheet to csv
-        df = pd.DataFrame.from_dict(records_data)
-        df.columns = ['Player Name', 'Squad', 'Role', 'Price (M)']
-        df.to_csv(os.path.join('data', 'PlayerList.csv'), index=False)
-
-        print("Sheet downloading completed")
-
-
+    # Without credentials, serve the sheets already in the data folder
+    if os.listdir("data") and not os.path.exists(sheets_client.CREDENTIALS_FILE):
+        print("No google credentials were found, so the sheets in the data folder will be used")
+        return
+
+    # Download only the sheets that changed since the last sync
+    print("Syncing sheets from google sheets")
+    changed = data_sync.sync("data")
+    print(f"Sheet syncing completed ({len(changed)} sheets changed)")
+
+
+# Keep the data folder in sync in the background when DATA_SYNC_INTERVAL (in seconds) is set. Every worker starts the
+# thread, but only one of them syncs at a time. Alternatively, leave it unset and run
+# `python data_sync.py --interval N` as a separate process
+if os.environ.get('DATA_SYNC_INTERVAL'):
+    data_sync.start_background_sync(int(os.environ['DATA_SYNC_INTERVAL']))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""Module containing a cache of rendered charts. Each chart is keyed on the function that draws it, its inputs and the
+data version, so a chart is only rendered once per data update. Charts are kept in memory up to a size limit, and are
+also written to a cache folder on disk that every gunicorn worker shares"""
+
+import pandas as pd
+import functools
+import hashlib
+import os
+import sheet_cache
+from lru_store import LRUStore
+
+# Folder shared by every worker for the on-disk cache
+CACHE_DIR = os.environ.get("CHART_CACHE_DIR", "chart_cache")
+
+# Limit on the total size of the charts held in memory. The least recently used charts are evicted first
+MAX_MEMORY_BYTES = 32 * 1024 * 1024
+
+# Charts held in memory, keyed by the cache key, along with the hit/miss counters used to check the cache is working
+_charts = LRUStore(max_bytes=MAX_MEMORY_BYTES, counters=('memory_hits', 'disk_hits', 'misses'))
+
+# The data version the on-disk cache was last pruned for
+_pruned_version = None
+
+def _fingerprint(value, digest):
+    """Adds the given chart input to the hash digest. Dataframes are hashed by their contents
+
+    :param value The chart input to add
+    :param digest The hashlib object to update"""
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        labels = list(value.columns) if isinstance(value, pd.DataFrame) else value.name
+        digest.update(repr(labels).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    else:
+        digest.update(repr(value).encode())
+    digest.update(b'\0')
+
+
+def chart_key(name, args, kwargs, version):
+    """Returns the cache key for a chart
+
+    :param name The name of the function that draws the chart
+    :param args The positional arguments of the function
+    :param kwargs The keyword arguments of the function
+    :param version The data version"""
+
+    digest = hashlib.sha1(name.encode())
+    for value in args:
+        _fingerprint(value, digest)
+    for key in sorted(kwargs):
+        digest.update(key.encode())
+        _fingerprint(kwargs[key], digest)
+    return f"{version}-{digest.hexdigest()}"
+
+
+def _disk_path(key):
+    """Returns the path of the on-disk cache file for the given key
+
+    :param key The cache key of the chart"""
+
+    return os.path.join(CACHE_DIR, f"{key}.chart")
+
+
+def _read_disk(key):
+    """Returns the chart with the given key from the on-disk cache, or None if it isn't there
+
+    :param key The cache key of the chart"""
+
+    try:
+        with open(_disk_path(key), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def prune_disk(version, keep=sheet_cache.KEEP_VERSIONS):
+    """Deletes the on-disk charts of all but the most recently written data versions. Workers switch versions at
+    slightly different times, so the charts of the versions still being served are kept, and temporary files that
+    another worker may still be writing are never touched
+
+    :param version The data version being written, which is always kept
+    :param keep The number of data versions to keep"""
+
+    # Find when each version's charts were last written
+    latest = {}
+    for file_name in os.listdir(CACHE_DIR):
+        if '.tmp' in file_name or '-' not in file_name:
+            continue
+        try:
+            mtime = os.stat(os.path.join(CACHE_DIR, file_name)).st_mtime
+        except OSError:
+            continue
+        file_version = file_name.split('-', 1)[0]
+        latest[file_version] = max(latest.get(file_version, 0), mtime)
+
+    # Delete the charts of the versions outside the window
+    kept = {version} | set(sorted(latest, key=latest.get, reverse=True)[:keep])
+    for file_name in os.listdir(CACHE_DIR):
+        if '.tmp' in file_name or file_name.split('-', 1)[0] in kept:
+            continue
+        try:
+            os.remove(os.path.join(CACHE_DIR, file_name))
+        except OSError:
+            pass
+
+
+def _write_disk(key, version, chart):
+    """Writes a chart to the on-disk cache. The file is written to a temporary path and renamed, so other workers never
+    read a half-written chart. Charts from old data versions are pruned the first time a new version is written
+
+    :param key The cache key of the chart
+    :param version The data version
+    :param chart The rendered chart"""
+
+    global _pruned_version
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{_disk_path(key)}.tmp{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(chart)
+        os.replace(temp_path, _disk_path(key))
+
+        if _pruned_version != version:
+            _pruned_version = version
+            prune_disk(version)
+    except OSError:
+        # The on-disk cache is only an optimisation, so the chart is still served if it can't be written
+        pass
+
+
+def cached_chart(draw):
+    """Decorator that caches the rendered chart returned by a graph function until the data changes
+
+    :param draw The graph function to cache"""
+
+    @functools.wraps(draw)
+    def wrapper(*args, **kwargs):
+        version = sheet_cache.data_version()[0]
+        key = chart_key(draw.__qualname__, args, kwargs, version)
+
+        # Check the in-memory cache
+        chart = _charts.get(key)
+        if chart is not None:
+            _charts.count("memory_hits")
+            return chart
+
+        # Check the on-disk cache, which may have been filled by another worker
+        chart = _read_disk(key)
+        if chart is not None:
+            _charts.count("disk_hits")
+            _charts.put(key, chart)
+            return chart
+
+        # Render the chart
+        _charts.count("misses")
+        chart = draw(*args, **kwargs)
+        _charts.put(key, chart)
+        _write_disk(key, version, chart)
+        return chart
+
+    return wrapper
+
+
+def clear(disk=False):
+    """Removes every chart from the in-memory cache, and optionally from the on-disk cache
+
+    :param disk Whether to also delete the on-disk cache files"""
+
+    _charts.clear()
+
+    if disk and os.path.isdir(CACHE_DIR):
+        for file_name in os.listdir(CACHE_DIR):
+            try:
+                os.remove(os.path.join(CACHE_DIR, file_name))
+            except OSError:
+                pass
+
+
+def cache_stats():
+    """Returns a dictionary containing the number of memory hits, disk hits, misses and evictions, along with the
+    number of charts and bytes currently held in memory"""
+
+    stats = _charts.stats()
+    stats["cached_charts"] = stats.pop("items")
+    stats["cached_bytes"] = stats.pop("bytes")
+    return stats
@@ -0,0 +1,202 @@
+"""Module containing the sync of the local mirror of the Google Sheets in the data folder. A spreadsheet is only read when
+Google Drive reports it has changed since the last sync, its worksheets are downloaded in parallel, and a csv file is
+only rewritten when its content has changed. Files are written to a temporary file and renamed, so workers serving
+requests never read a half-written csv file. Run it as a script to sync once (or every --interval seconds, e.g. as a
+separate worker process), or start it as a background job. Only one process on the machine syncs at a time"""
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
+import pandas as pd
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import sheet_cache
+import sheets_client
+import snapshot
+import data_versions
+
+# A worksheet mirrored to the data folder. range is the range of cells to download, and columns is the list of column
+# names, or None if the first downloaded row holds the column names
+SheetSource = namedtuple('SheetSource', ['sheet', 'spreadsheet', 'index', 'range', 'columns'])
+
+# Every worksheet in the mirror
+SOURCES = [SheetSource(sheet, sheets_client.STATS_SPREADSHEET, i, 'A1:AD200' if sheet == "TeamList" else 'A2:AD200',
+                       None) for i, sheet in enumerate(snapshot.SHEETS[:12])]
+SOURCES.append(SheetSource('PlayerList', sheets_client.TEAM_SELECTION_SPREADSHEET, 0, 'B2:E200',
+                           ['Player Name', 'Squad', 'Role', 'Price (M)']))
+
+# File recording the Google Drive modification time of each spreadsheet at the last sync
+MANIFEST_FILE = 'sync_manifest.json'
+
+# The maximum number of worksheets downloaded at once
+MAX_WORKERS = 6
+
+# Files in the data folder locked by the process syncing, and by the one process running the background sync
+SYNC_LOCK_FILE = ".sync.lock"
+LEADER_LOCK_FILE = ".sync-leader.lock"
+
+# Lock making sure only one sync runs at a time in this process. The file lock does the same across processes
+_sync_lock = threading.Lock()
+
+
+def _manifest_path(data_dir):
+    return os.path.join(data_dir, MANIFEST_FILE)
+
+
+def load_manifest(data_dir=sheet_cache.DATA_DIR):
+    """Returns the dictionary from each spreadsheet title to its modification time at the last sync
+
+    :param data_dir The data folder"""
+
+    try:
+        with open(_manifest_path(data_dir)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def file_hash(path):
+    """Returns the sha256 hash of the given file, or None if it doesn't exist
+
+    :param path The path of the file"""
+
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def download_sheet(source):
+    """Downloads the given worksheet and returns its contents as csv text, in the same format as the files in the data
+    folder
+
+    :param source The SheetSource of the worksheet"""
+
+    records_data = sheets_client.get_worksheet(source.spreadsheet, source.index).get(source.range)
+    df = pd.DataFrame.from_dict(records_data)
+    if source.columns is None:
+        df.columns = [x.strip() for x in df.iloc[0]]
+        df = df[1:]
+    else:
+        df.columns = source.columns
+    return df.to_csv(index=False)
+
+
+def write_sheet(data_dir, sheet, csv_text):
+    """Writes a sheet's csv file if its content has changed, by writing a temporary file and renaming it. Returns True
+    if the file was written
+
+    :param data_dir The data folder
+    :param sheet The name of the sheet (name of the csv file without the extension '.csv')
+    :param csv_text The csv text of the sheet"""
+
+    path = os.path.join(data_dir, f"{sheet}.csv")
+    data = csv_text.encode()
+    if hashlib.sha256(data).hexdigest() == file_hash(path):
+        return False
+
+    def write(temp_path):
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+
+    snapshot.write_atomically(path, write)
+    return True
+
+
+def sync(data_dir=sheet_cache.DATA_DIR, force=False, workers=MAX_WORKERS):
+    """Brings the data folder up to date with the Google Sheets, and returns the list of sheets that changed. Once any
+    sheet has changed, the data folder is published as a new version (see data_versions.py), which every process
+    switches to once its caches are warm
+
+    :param data_dir The data folder
+    :param force If True, every worksheet is downloaded even if Google Drive reports its spreadsheet hasn't changed
+    :param workers The maximum number of worksheets downloaded at once"""
+
+    os.makedirs(data_dir, exist_ok=True)
+    with _sync_lock, data_versions.file_lock(os.path.join(data_dir, SYNC_LOCK_FILE)):
+        manifest = load_manifest(data_dir)
+
+        # Only read the spreadsheets that have changed since the last sync, along with any sheet missing locally
+        modified_times = {title: sheets_client.get_modified_time(title) for title in {x.spreadsheet for x in SOURCES}}
+        sources = [x for x in SOURCES if force or manifest.get(x.spreadsheet) != modified_times[x.spreadsheet]
+                   or not os.path.exists(os.path.join(data_dir, f"{x.sheet}.csv"))]
+
+        # Download the worksheets in parallel, then write the ones whose content changed
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            downloads = list(executor.map(download_sheet, sources))
+        changed = [source.sheet for source, csv_text in zip(sources, downloads)
+                   if write_sheet(data_dir, source.sheet, csv_text)]
+
+        # Publish the new sheets as a version and switch this process to it. Other processes switch when they notice
+        # the new version
+        if changed or data_versions.current_version(data_dir) is None:
+            data_versions.publish(data_dir)
+            data_versions.reload(wait=True)
+
+        # Record the modification times only once the files are written, so a failed sync is retried
+        def write_manifest(path):
+            with open(path, 'w') as f:
+                json.dump(modified_times, f)
+
+        snapshot.write_atomically(_manifest_path(data_dir), write_manifest)
+
+        return changed
+
+
+def run_sync_loop(interval, data_dir=sheet_cache.DATA_DIR):
+    """Syncs the data folder every interval seconds, forever
+
+    :param interval The number of seconds between syncs
+    :param data_dir The data folder"""
+
+    while True:
+        time.sleep(interval)
+        try:
+            changed = sync(data_dir)
+            if changed:
+                print(f"Synced {', '.join(changed)} from google sheets")
+        except Exception as e:
+            print(f"Syncing from google sheets failed: {e}")
+
+
+def start_background_sync(interval, data_dir=sheet_cache.DATA_DIR):
+    """Starts a daemon thread that syncs the data folder every interval seconds, and returns the thread. When several
+    processes (e.g. gunicorn workers) start one, only the process holding the leader lock syncs, and the others keep
+    trying to take over the lock in case that process exits. The other processes pick up new versions through
+    data_versions as usual
+
+    :param interval The number of seconds between syncs
+    :param data_dir The data folder"""
+
+    def run():
+        os.makedirs(data_dir, exist_ok=True)
+        while True:
+            with data_versions.file_lock(os.path.join(data_dir, LEADER_LOCK_FILE), blocking=False) as leader:
+                if leader:
+                    run_sync_loop(interval, data_dir)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name='data-sync', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the google sheets that changed since the last sync")
+    parser.add_argument('--data', default=sheet_cache.DATA_DIR, help="folder the sheets are mirrored to")
+    parser.add_argument('--force', action='store_true', help="download every worksheet, even if it hasn't changed")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="number of worksheets downloaded at once")
+    parser.add_argument('--interval', type=int, help="keep syncing every INTERVAL seconds instead of syncing once")
+    args = parser.parse_args()
+
+    if args.interval:
+        with data_versions.file_lock(os.path.join(args.data, LEADER_LOCK_FILE)):
+            run_sync_loop(args.interval, args.data)
+
+    start = time.perf_counter()
+    changed = sync(args.data, args.force, args.workers)
+    print(f"{len(changed)} sheets changed ({', '.join(changed) or 'none'}) in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,234 @@
+"""Module containing the versioned data folders. Publishing copies the sheets in the data folder into a new, never
+modified version folder along with its snapshot, then points the CURRENT file at it. Each worker notices the new
+version, builds the derived structures for it in the background and only then switches to it. Every request is pinned
+to the version it started with, so requests in flight finish on the old data and no request mixes two versions"""
+
+from flask import g, request, jsonify, abort
+from contextlib import contextmanager
+import hashlib
+import hmac
+import os
+import shutil
+import threading
+import time
+import sheet_cache
+import snapshot
+from player_registry import get_player_registry
+from roster_index import get_roster_index
+from season_store import get_season_store
+from dream_team_engine import get_dream_teams
+from team_analytics import get_team_analytics
+from standings_history import get_standings_history
+
+# How often (in seconds) each worker checks the CURRENT file for a new version
+WATCH_INTERVAL = 2
+
+# Functions that build the derived structures, called for a new version before it is served
+WARMERS = [get_player_registry, get_roster_index, get_season_store, get_dream_teams, get_team_analytics,
+           get_standings_history]
+
+# File in the data folder locked while a version is being published, so processes never publish at the same time
+PUBLISH_LOCK_FILE = ".publish.lock"
+
+# File locks aren't available on every platform. Without them, publishing is only serialised within a process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Lock held while this process is switching versions, and the time the CURRENT file was last checked
+_switch_lock = threading.Lock()
+_last_check = 0
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Context manager holding an exclusive lock on the given file, shared by every process on the machine. Yields True
+    if the lock was acquired, which is always the case when blocking
+
+    :param path The path of the lock file
+    :param blocking If False, yields False straight away when another process holds the lock"""
+
+    with open(path, 'a') as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def versions_dir(data_dir=sheet_cache.DATA_DIR):
+    """Returns the folder the published versions are kept in
+
+    :param data_dir The data folder"""
+
+    return os.path.join(data_dir, sheet_cache.VERSIONS_DIR)
+
+
+def content_hash(data_dir):
+    """Returns a short hash of the contents of the sheets in the given folder
+
+    :param data_dir The folder containing the csv files"""
+
+    sha = hashlib.sha1()
+    for sheet in snapshot.SHEETS:
+        path = os.path.join(data_dir, f"{sheet}.csv")
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                sha.update(sheet.encode() + f.read())
+    return sha.hexdigest()[:12]
+
+
+def publish(data_dir=sheet_cache.DATA_DIR):
+    """Copies the sheets in the data folder into a new version folder, compiles its snapshot and points the CURRENT file
+    at it. Returns the name of the published version. Nothing is published if the sheets haven't changed since the
+    current version
+
+    :param data_dir The data folder"""
+
+    os.makedirs(versions_dir(data_dir), exist_ok=True)
+    with file_lock(os.path.join(data_dir, PUBLISH_LOCK_FILE)):
+        digest = content_hash(data_dir)
+        current = current_version(data_dir)
+        if current is not None and current.endswith(digest):
+            return current
+
+        # Build the version in a temporary folder, so a half-built version is never served. A version folder with the
+        # same name can only hold the same sheets, so an existing one is reused
+        name = f"{time.strftime('%Y%m%d%H%M%S')}-{digest}"
+        out_dir = os.path.join(versions_dir(data_dir), name)
+        if not os.path.isdir(out_dir):
+            temp_dir = f"{out_dir}.tmp{os.getpid()}"
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            os.makedirs(temp_dir)
+            for sheet in snapshot.SHEETS:
+                path = os.path.join(data_dir, f"{sheet}.csv")
+                if os.path.exists(path):
+                    shutil.copy2(path, temp_dir)
+            snapshot.write_snapshot(temp_dir)
+            os.replace(temp_dir, out_dir)
+
+        # Switch the pointer
+        def write_pointer(path):
+            with open(path, 'w') as f:
+                f.write(name)
+
+        snapshot.write_atomically(os.path.join(data_dir, sheet_cache.CURRENT_FILE), write_pointer)
+        prune(data_dir)
+        return name
+
+
+def current_version(data_dir=sheet_cache.DATA_DIR):
+    """Returns the name of the version the CURRENT file points at, or None if no version has been published
+
+    :param data_dir The data folder"""
+
+    try:
+        with open(os.path.join(data_dir, sheet_cache.CURRENT_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def prune(data_dir=sheet_cache.DATA_DIR, keep=sheet_cache.KEEP_VERSIONS):
+    """Deletes all but the newest published versions. The current version is never deleted
+
+    :param data_dir The data folder
+    :param keep The number of versions to keep"""
+
+    current = current_version(data_dir)
+    names = sorted(x for x in os.listdir(versions_dir(data_dir)) if '.tmp' not in x)
+    for name in names[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(versions_dir(data_dir), name), ignore_errors=True)
+
+
+def warm(data_dir):
+    """Builds every derived structure of the given data folder, so the first requests served from it are fast
+
+    :param data_dir The data folder"""
+
+    token = sheet_cache.pin(data_dir)
+    try:
+        for warmer in WARMERS:
+            warmer()
+    finally:
+        sheet_cache.unpin(token)
+
+
+def reload(wait=False):
+    """Switches this process to the published version if it isn't serving it already. The new version is warmed up
+    before the switch, in a background thread unless wait is True. Returns True if a switch was started
+
+    :param wait If True, the switch is finished before returning"""
+
+    target = sheet_cache.published_dir()
+    if target == sheet_cache.active_dir() or not _switch_lock.acquire(blocking=False):
+        return False
+
+    def switch():
+        try:
+            warm(target)
+            sheet_cache.set_active_dir(target)
+        finally:
+            _switch_lock.release()
+
+    if wait:
+        switch()
+    else:
+        threading.Thread(target=switch, name='data-reload', daemon=True).start()
+    return True
+
+
+def status():
+    """Returns a dictionary with the version being served by this process, the published version and whether this
+    process is switching to it"""
+
+    return {'active': os.path.basename(sheet_cache.active_dir()),
+            'published': os.path.basename(sheet_cache.published_dir()),
+            'switching': _switch_lock.locked()}
+
+
+def init_app(app):
+    """Registers hooks on the given Flask app that pin each request to the version being served, and check for a new
+    version every WATCH_INTERVAL seconds. Also adds the admin endpoint /admin/reload, which is only enabled when the
+    ADMIN_TOKEN environment variable is set
+
+    :param app The Flask app"""
+
+    @app.before_request
+    def pin_data_version():
+        global _last_check
+
+        # Look for a new version, at most once every WATCH_INTERVAL seconds
+        now = time.monotonic()
+        if now - _last_check >= WATCH_INTERVAL:
+            _last_check = now
+            reload()
+
+        g.data_version_token = sheet_cache.pin()
+
+    @app.teardown_request
+    def unpin_data_version(exception=None):
+        token = g.pop('data_version_token', None)
+        if token is not None:
+            sheet_cache.unpin(token)
+
+    @app.route('/admin/reload', methods=['POST'])
+    def admin_reload():
+        admin_token = os.environ.get('ADMIN_TOKEN')
+        if not admin_token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            abort(404)
+
+        # Publish the data folder if asked to, then switch this worker. The other workers switch when they next check
+        if request.args.get('publish'):
+            publish()
+        reload(wait=True)
+        return jsonify(status())
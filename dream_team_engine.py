@@ -0,0 +1,99 @@
+"""Module containing the dream team engine, which picks the dream team for the TotalStats sheet and every week in one
+vectorised pass. The top players of each role are found with a partial sort (argpartition) over a (player, column)
+matrix of points, where the first column is TotalStats and the others are the weeks"""
+
+import numpy as np
+import pandas as pd
+import sheet_cache
+from player_registry import get_player_registry
+from season_store import get_season_store, WEEK_SHEETS
+
+# The number of players of each role in a dream team, in the order they appear in the table
+DREAM_TEAM_SLOTS = [('Batsman', 4), ('All-Rounder', 3), ('Wicket-keeper', 1), ('Bowler', 3)]
+
+
+def dream_team_rows(points, roles):
+    """Returns a tuple (rows, degenerate). rows is an array of shape (dream team size, column) giving the player rows
+    of the dream team for each column of points, in table order (-1 where there weren't enough players of a role).
+    degenerate is a boolean array marking the columns where no points were scored, which have no dream team
+
+    :param points An array of shape (player, column) of the points to pick the dream teams from
+    :param roles An array of the Player Role of each row of points"""
+
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim == 1:
+        points = points[:, np.newaxis]
+    roles = np.asarray(roles, dtype=object)
+
+    # A column is degenerate if its points are all zeros (i.e either no points were scored or the week hasn't happened yet)
+    degenerate = points.sum(axis=0) == 0
+
+    role_rows = []
+    for role, k in DREAM_TEAM_SLOTS:
+        candidates = np.flatnonzero(roles == role)
+        picked = np.full((k, points.shape[1]), -1, dtype=np.int64)
+        n = min(k, len(candidates))
+        if n > 0:
+            role_points = points[candidates]
+
+            # Sort each column by points (highest first, with ties going to the player higher up the sheet) and take
+            # the top n. Each role only has a few dozen players, so a full sort is cheap
+            sheet_order = np.broadcast_to(np.arange(len(candidates))[:, np.newaxis], role_points.shape)
+            order = np.lexsort((sheet_order, -role_points), axis=0)[:n]
+            picked[:n] = candidates[order]
+        role_rows.append(picked)
+
+    return np.concatenate(role_rows), degenerate
+
+
+class DreamTeams:
+    """The dream teams for the TotalStats sheet and every week
+
+    :param total_stats_df The TotalStats dataframe
+    :param store The season store holding the weekly points
+    :param registry The player registry (from player_registry.get_player_registry())"""
+
+    def __init__(self, total_stats_df, store, registry):
+        self.columns = ['TotalStats'] + list(store.weeks)
+
+        # Build the (player, column) matrix of points, lining the TotalStats rows up with the season store's players
+        total_points = total_stats_df.set_index('Player Number')['TOTAL'].reindex(store.player_numbers).fillna(0)
+        points = np.column_stack([total_points.to_numpy(dtype=np.float64), store.stat('TOTAL')])
+
+        # Pick every dream team at once
+        rows, degenerate = dream_team_rows(points, store.player_roles)
+
+        # Names are taken from TotalStats by Player Number, since the weekly sheets don't always spell them the same way
+        player_names = registry.names(store.player_numbers)
+
+        # Convert each column's picks to a dataframe, or None if the column is degenerate
+        self.teams = {}
+        for i, column in enumerate(self.columns):
+            if degenerate[i]:
+                self.teams[column] = None
+                continue
+            picked = rows[:, i][rows[:, i] >= 0]
+            self.teams[column] = pd.DataFrame({'NAME': player_names[picked],
+                                               'ROLE': store.player_roles[picked],
+                                               'POINTS': points[picked, i]})
+
+    def team(self, column):
+        """Returns the dream team of the given column as a dataframe with the columns NAME, ROLE and POINTS, or None if
+        no points were scored
+
+        :param column 'TotalStats' or a week name (e.g 'Week1')"""
+
+        return self.teams[column]
+
+    def active_weeks(self):
+        """Returns a list of the week numbers that have a dream team"""
+
+        return [i + 1 for i, week in enumerate(self.columns[1:]) if self.teams[week] is not None]
+
+
+def get_dream_teams():
+    """Returns the dream teams for the current version of the TotalStats and weekly sheets"""
+
+    return sheet_cache.get_derived('dream_teams', ['TotalStats'] + WEEK_SHEETS,
+                                   lambda: DreamTeams(sheet_cache.get_sheet('TotalStats'), get_season_store(),
+                                                      get_player_registry()))
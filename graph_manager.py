@@ -1,52 +1,23 @@
-from table_data_manager import numbers_to_names, get_sheet_df, generate_league_table_df
+from player_registry import get_player_registry
+from season_store import get_season_store, CATEGORY_COLUMNS
+from team_analytics import get_team_analytics
+from standings_history import get_standings_history
+from chart_cache import cached_chart
+from series_prep import cumulative_to_date
+import numpy as np
 import pygal
-from pygal.style import DarkGreenBlueStyle, DefaultStyle, DarkStyle
+from pygal.style import DarkStyle
 import pandas as pd
 
 # DarkStyle class which will be used for all graphs
 style = DarkStyle
 weeks = [f"Week{x}" for x in range(1, 11)]
 
-###-------------------------------------------------------------
-# Utility functions
-###-------------------------------------------------------------
-
-def cumulative(ls):
-    """Given a list of numerical values, returns the corresponding cumulative list
-    
-    :param ls The numerical list to get the corresponding cumulative list of"""
-    
-    # Initialise new list
-    value = 0
-    new_ls = []
-
-    # Calculate cumulative values
-    for x in ls:
-        value += x
-        new_ls.append(value)
-    return new_ls
-
-def count_trailing_zeros(ls):
-    """Returns the number of trailing zeros in a numerical list. e.g [1,2,3,4,0,0,0] would return 3
-    
-    :param ls The numerical list to count the number of trailing zeros of"""
-    
-    # Initialise counter
-    count = 0
-
-    # Count the trailing zeros
-    for x in ls[::-1]:
-        if x == 0:
-            count += 1
-        else:
-          break
-    return count
-
-
 ###-------------------------------------------------------------
 # Graph data for Home page
 ###-------------------------------------------------------------
 
+@cached_chart
 def role_pie_chart(total_stats_df):
     """Returns a pie chart with 4 sectors: Batsmen, Bowlers, All-Rounders, Wicket-Keepers
     
@@ -71,9 +42,10 @@ def role_pie_chart(total_stats_df):
     pie_chart.add('Wicket-Keepers', keeper_count)
 
     # Render pie chart
-    pie_data = pie_chart.render_data_uri()
+    pie_data = pie_chart.render(is_unicode=True)
     return pie_data
     
+@cached_chart
 def mvp_radar_graph(total_stats_df):
     """Returns a radar graph for the MVP (person with the most total points). The radar graph breaks down their points by batting, bowling, fielding and bonus
     
@@ -97,10 +69,11 @@ def mvp_radar_graph(total_stats_df):
     radar_chart.add(mvp_name, mvp_stats[2:6])
 
     # Render the radar chart
-    radar_graph_data = radar_chart.render_data_uri()
+    radar_graph_data = radar_chart.render(is_unicode=True)
     return radar_graph_data
 
 
+@cached_chart
 def top_n_league_graph(n, league_df):
     """Returns a line graph with n lines. The graph gives the cumulative weekly points breakdown of the current top n teams in the league table
     
@@ -110,13 +83,9 @@ def top_n_league_graph(n, league_df):
     # Get top n teams from league table
     top_n = list(league_df.head(n)["Team Name"])
 
-    # Get the top n teams' weekly points breakdown as a dataframe
-    team_list = get_sheet_df("TeamList")
-
-    # Remove unecessary trailing zeros and transform data to cumulative data
-    data = [list(team_points_df(y, team_list).iloc[0]) for y in top_n]
-    min_zeros = min([count_trailing_zeros(x) for x in data])
-    data = [cumulative(x)[:-min_zeros] for x in data]
+    # Slice the top n teams' cumulative points out of the standings history
+    history = get_standings_history()
+    data = history.cumulative[[history.analytics.team_index(x) for x in top_n]].tolist()
 
     # Style the graph 
     graph = pygal.Line(style=style, margin=35, stroke_style={'width': 3})
@@ -129,68 +98,58 @@ def top_n_league_graph(n, league_df):
         graph.add(team, values)
     
     # Render the graph
-    graph_data = graph.render_data_uri()
+    graph_data = graph.render(is_unicode=True)
+    return graph_data
+
+@cached_chart
+def league_position_graph(n, league_df):
+    """Returns a line graph with n lines. The graph gives the league position after each week of the current top n teams
+    in the league table
+
+    :param n The number of lines the graph will have, corresponding to the current top n teams
+    :param league_df The current league table as a dataframe (obtained from table_data_manager.generate_league_table_df)"""
+
+    # Get top n teams from league table
+    top_n = list(league_df.head(n)["Team Name"])
+
+    # Slice the top n teams' positions out of the standings history
+    history = get_standings_history()
+    data = history.ranks[[history.analytics.team_index(x) for x in top_n]].tolist()
+
+    # Style the graph, with first place at the top
+    graph = pygal.Line(style=style, margin=35, stroke_style={'width': 3}, inverse_y_axis=True)
+    graph.title = f"Current Top {n} League Positions"
+    graph.y_title = "League Position"
+    graph.x_labels = weeks
+    graph.y_labels = list(range(1, int(np.max(data, initial=1)) + 1))
+
+    # Add the data to the graph
+    for team, values in zip(top_n, data):
+        graph.add(team, values)
+
+    # Render the graph
+    graph_data = graph.render(is_unicode=True)
     return graph_data
 
 ###-------------------------------------------------------------
 # Graph data for Team-Stats page
 ###-------------------------------------------------------------
-def team_points_df(team_name, team_list_df):
-    """Returns a dataframe giving a weekly breakdown of a team's total points
-    
-    :param team_name The team name to get the weekly points breakdown of
-    :param team_list_df The dataframe containing the data needed (in this case we will have team_list_df = get_sheet_df('TeamList')"""
+def team_points_df(team_name):
+    """Returns a dataframe giving a weekly breakdown of a team's total points, or throws an exception if the team was not found
 
-    # Get team names as a list
-    team_names = list(team_list_df['Team Name'])
-    
-    # Trim the data to get the weekly points only
-    team_list = team_list_df.drop(['Team Name', 'Team Owner', 'Batsman 1', 'Batsman 2', 'Batsman 3', 'Batsman 4', 'All-Rounder 1','All-Rounder 2', 'All-Rounder 3', 
-                    'Wicket-keeper', 'Bowler 1', 'Bowler 2', 'Bowler 3', 'Total Points'], axis=1)
+    :param team_name The team name to get the weekly points breakdown of"""
 
-    # Get the correct row of the dataframe, otherwise throw an exception if the team was not found
-    if team_name in team_names:
-        # Get correct row
-        row_index = team_names.index(team_name)
-        team_points_breakdown = team_list.iloc[[row_index]]
+    week_points = get_team_analytics().team_week_points([team_name])
+    return pd.DataFrame(week_points, columns=['Week 1', 'Week 2', 'Week 3', 'Week 4', 'Week 5', 'Week 6', 'Week 7', 'Week 8', 'Week 9', 'Week 10'])
 
-        # Rename columns for graph presentation
-        team_points_breakdown.columns = ['Week 1', 'Week 2', 'Week 3', 'Week 4', 'Week 5', 'Week 6', 'Week 7', 'Week 8', 'Week 9', 'Week 10']
-        return team_points_breakdown
+def team_players_breakdown_df(team_name):
+    """Returns a dataframe giving the weekly breakdown of points for a specific team by player
 
-    else:
-        raise Exception(f"Couldn't find '{team_name}' on the TeamList")
+    :param team_name The team name to get the dataframe of"""
 
-def team_players_breakdown_df(team_name, team_list_df):
-    """Returns a dataframe giving the weekly breakdown of points for a specific team by player
-    
-    :param team_name The team name to get the dataframe of
-    :param team_list_df The dataframe containing the data needed (in this case we will have team_list_df = get_sheet_df('TeamList')"""
-
-    # Get list of roles
-    roles = ['Batsman 1', 'Batsman 2', 'Batsman 3', 'Batsman 4', 'All-Rounder 1','All-Rounder 2', 'All-Rounder 3', 
-                    'Wicket-keeper', 'Bowler 1', 'Bowler 2', 'Bowler 3']
-
-    # Get team points breakdown by week
-    team_names = list(team_list_df['Team Name'])
-    row_index = team_names.index(team_name)
-    team_points_breakdown = team_list_df.iloc[[row_index]]
-
-    # Get player names in the team
-    player_numbers = [int(team_points_breakdown[role]) for role in roles]
-    player_names = numbers_to_names(player_numbers)
-
-    # Generate dataframe
-    df = pd.DataFrame(zip(roles, player_names), columns =["Role" , "Name"])
-
-    weeks = [f"Week{i}" for i in range(1, 11)]
-    for week in weeks:
-      week_df = get_sheet_df(week)[["Player Number", "TOTAL"]]
-      points = week_df.set_index('Player Number').loc[player_numbers].reset_index()
-      df[week] = points["TOTAL"]
-    
-    return df
+    return get_team_analytics().breakdown_df(team_name)
 
+@cached_chart
 def team_points_stacked_bar_graph(team_name, breakdown_df):
     """Returns a stacked bar graph giving the weekly breakdown of points for a specific team
     
@@ -206,62 +165,42 @@ def team_points_stacked_bar_graph(team_name, breakdown_df):
       values = row[weeks]
       graph.add(label, values)
     
-    return graph.render_data_uri()
+    return graph.render(is_unicode=True)
 
+@cached_chart
 def team_points_stacked_line_graph(team_name, breakdown_df):
     """Returns a stacked line graph giving the cumulative weekly breakdown of points for a specific team
     
     :param team_name The team name to generate the graph of
     :param breakdown_df The dataframe containing the data needed (in this case we will have breakdown_df = team_players_breakdown_df(team_name, team_list_df)"""
 
-    # Get cumulative data
-    zeros = []
-    data = []
-    for _, row in breakdown_df.iterrows():
-      label = f"{row['Name']}"
-      values = row[weeks]
-      zeros.append(count_trailing_zeros(values))
-      values = cumulative(values)
-      data.append((label, values))
-    
-    # Number of weeks to trim
-    min_zeros = min(zeros)
+    # Get cumulative data, removing the weeks no player has played yet
+    labels = [f"{x}" for x in breakdown_df['Name']]
+    data = cumulative_to_date(breakdown_df[weeks].to_numpy()).tolist()
 
     # Generate graph
     graph = pygal.StackedLine(style=style, fill=True)
     graph.title = f"{team_name} Points Tracker"
-    graph.x_labels = weeks[:-min_zeros]
-    for label, values in data:
-      graph.add(label, values[:-min_zeros],  allow_interruptions=True)
+    graph.x_labels = weeks[:len(data[0])]
+    for label, values in zip(labels, data):
+      graph.add(label, values,  allow_interruptions=True)
     
     # Render graph
-    graph_data = graph.render_data_uri()
+    graph_data = graph.render(is_unicode=True)
     return graph_data
 
-def team_roster_radar_graph(team_name, team_list_df, total_stats_df):
+@cached_chart
+def team_roster_radar_graph(team_name):
     """Returns a radar graph with 11 lines, giving the points by category breakdown for each player
     
-    :param team_name The team name to generate the graph of
-    :param team_list_df The dataframe containing the data needed (in this case we will have team_list_df = get_sheet_df('TeamList')
-    :param team_list_df The dataframe containing the data needed (in this case we will have total_stats_df = get_sheet_df('TotalStats')"""
-
-    # Trim the data to get the team names and rosters only
-    team_rosters = team_list_df.drop(['Team Owner', 'Week 1 Points', 'Week 2 Points', 'Week 3 Points', 'Week 4 Points', 'Week 5 Points', 'Week 6 Points', 
-                                    'Week 7 Points', 'Week 8 Points', 'Week 9 Points', 'Week 10 Points', 'Total Points'], axis=1)
-    team_names = list(team_rosters['Team Name'])
-
-    # Get the correct team roster as a list of names, otherwise throw an exception if the team was not found
-    if team_name in team_names:
-        row_index = team_names.index(team_name)
-        team_roster = list(team_rosters.iloc[row_index])[1:]
-    else:
-        raise Exception(f"Couldn't find '{team_name}' on the TeamList")
-    
-    # Get the batting, bowling, fielding and bonus points of everyone in the roster (stored in a list of tuples)
-    team_roster_points = [(total_stats_df['BATTING'][x-1], 
-                        total_stats_df['BOWLING'][x-1], 
-                        total_stats_df['FIELDING'][x-1],
-                        total_stats_df['BONUS'][x-1]) for x in team_roster]
+    :param team_name The team name to generate the graph of"""
+
+    # Get the names and the batting, bowling, fielding and bonus points of everyone in the roster, otherwise throw an
+    # exception if the team was not found
+    analytics = get_team_analytics()
+    team = analytics.team_index(team_name)
+    player_names = list(analytics.roster_names[team])
+    team_roster_points = [tuple(x) for x in analytics.categories[team].tolist()]
 
     # Generate the radar graph
     radar_graph = pygal.Radar(style=style)
@@ -269,11 +208,10 @@ def team_roster_radar_graph(team_name, team_list_df, total_stats_df):
     radar_graph.x_labels = ['Batting Points', 'Bowling Points', 'Fielding Points', 'Bonus Points']
     
     # Add data and return
-    player_names = numbers_to_names(team_roster)
     for i, name in enumerate(player_names):
         radar_graph.add(name, team_roster_points[i])
     
-    radar_graph_data = radar_graph.render_data_uri()
+    radar_graph_data = radar_graph.render(is_unicode=True)
     return radar_graph_data
 
 
@@ -281,36 +219,22 @@ def team_roster_radar_graph(team_name, team_list_df, total_stats_df):
 # Graph data for Player-stats page
 ###-------------------------------------------------------------
 
-def player_points_df(player_name, weekly_dfs):
+def player_points_df(player_name):
     """Returns a dataframe giving a weekly breakdown of a player's total points, splitting the points up by category
     
-    :param player_name The player name to get the weekly points breakdown of
-    :param weekly_dfs The list of dataframes containing the data needed (in this case we will store Week1, Week2, ..., Week10, TotalStats in the list)"""
+    :param player_name The player name to get the weekly points breakdown of"""
+
+    # Resolve the player's number from the TotalStats sheet, then get their weekly points by category from the season
+    # store, otherwise throw an exception if the player was not found
+    store = get_season_store()
+    player_number = get_player_registry().number(player_name)
+    player_points = store.player(player_number)[:, store.stat_index(CATEGORY_COLUMNS)]
 
-    # Get player names as a list from the TotalStats sheet
-    player_names = list(weekly_dfs[10]['Player Name'])
-    
-    # Get the correct row of the dataframe, otherwise throw an exception if the team was not found
-    if player_name in player_names:
-        # Get correct row
-        row_index = player_names.index(player_name)
-    else:
-        raise Exception(f"Couldn't find '{player_name}' on the TotalStats spreadsheet")
-
-    # Get weekly points breakdown by category
-    player_points = []
-    for i in range(0, 10):
-        batting_points = weekly_dfs[i].iloc[row_index]['BATTING']
-        bowling_points = weekly_dfs[i].iloc[row_index]['BOWLING']
-        fielding_points = weekly_dfs[i].iloc[row_index]['FIELDING']
-        bonus_points = weekly_dfs[i].iloc[row_index]['BONUS']
-        
-        player_points.append((batting_points, bowling_points, fielding_points, bonus_points))
-    
     # Create the dataframe
     df = pd.DataFrame(player_points, columns=['Batting Points', 'Bowling Points', 'Fielding Points', 'Bonus Points'])
     return df
 
+@cached_chart
 def player_points_bar_graph(player_name, player_points_df):
     """Returns a bar graph giving the weekly points breakdown by category of a given player
     
@@ -329,39 +253,32 @@ def player_points_bar_graph(player_name, player_points_df):
     bar_graph.add('Bonus Points', player_points_df['Bonus Points'])
 
     # Render graph
-    graph_data = bar_graph.render_data_uri()
+    graph_data = bar_graph.render(is_unicode=True)
     return graph_data
 
+@cached_chart
 def player_points_line_graph(player_name, player_points_df):
     """Returns a stacked line graph giving the cumulative weekly points of a given player broken down by their role
 
     :param player_name The player to generate the graph of
     :param player_points_df The dataframe containing the necessary data (in this case we will obtain in from the player_points_df() function"""
 
-    # Get cumulative data
-    zeros = []
-    data = []
+    # Get cumulative data for each category, removing the weeks after the player's last game
     roles = player_points_df.columns
-    for role in roles:
-      values = player_points_df[role]
-      zeros.append(count_trailing_zeros(values))
-      values = cumulative(values)
-      data.append((role, values))
-    
-    # Number of weeks to trim
-    min_zeros = min(zeros)
+    data = cumulative_to_date(player_points_df.to_numpy().T).tolist()
 
     # Generate graph
     graph = pygal.StackedLine(style=style, fill=True)
     graph.title = f"{player_name} Points Tracker"
-    graph.x_labels = weeks[:-min_zeros]
-    for label, values in data:
-      graph.add(label, values[:-min_zeros],  allow_interruptions=True)
+    graph.x_labels = weeks[:len(data[0])]
+    for label, values in zip(roles, data):
+      graph.add(label, values,  allow_interruptions=True)
     
     # Render graph
-    graph_data = graph.render_data_uri()
+    graph_data = graph.render(is_unicode=True)
     return graph_data
 
+@cached_chart
 def player_points_radar_graph(player_name, player_points_df):
     """Returns a radar graph giving the breakdown of the given player's points by category
 
@@ -379,7 +296,7 @@ def player_points_radar_graph(player_name, player_points_df):
     graph.title = f"{player_name} Points By Category"
     graph.x_labels = ['Batting', 'Bowling', 'Fielding', 'Bonus']
     graph.add(player_name, total_points)
-    graph_data = graph.render_data_uri()
+    graph_data = graph.render(is_unicode=True)
     return graph_data
 
 
@@ -389,8 +306,7 @@ def player_points_radar_graph(player_name, player_points_df):
 
 if __name__ == "__main__":
   team_name = "The Stoin CC"
-  team_list = get_sheet_df("TeamList")
-  df = team_players_breakdown_df(team_name, team_list)
+  df = team_players_breakdown_df(team_name)
   print(df)
 
 
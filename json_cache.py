@@ -0,0 +1,124 @@
+"""Module containing a cache of JSON API responses. Each response is serialised compactly and compressed once per data
+update, keyed on the route, its arguments and the data version. Clients get the gzip (or brotli, when the brotli
+package is installed) encoding they accept, along with an ETag so polling clients get a 304 response when nothing
+changed"""
+
+from datetime import datetime, timezone
+from flask import request, Response
+import functools
+import hashlib
+import gzip
+import json
+import sheet_cache
+from lru_store import LRUStore
+
+# Brotli is optional, responses are only gzipped without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Limits on the number of responses and the total size of the responses in the cache. The least recently used
+# responses are evicted first
+MAX_RESPONSES = 2048
+MAX_BYTES = 32 * 1024 * 1024
+
+# Bodies smaller than this are sent uncompressed, since compressing them saves next to nothing
+MIN_COMPRESS_BYTES = 512
+
+# Cached responses, keyed by (endpoint, view arguments, data version), along with the hit/miss counters used to check
+# the cache is working. Each value is a tuple of the form (bodies, etag, last_modified), where bodies is a dictionary
+# from each content encoding to the encoded body
+_responses = LRUStore(MAX_RESPONSES, MAX_BYTES, size=lambda entry: sum(len(x) for x in entry[0].values()),
+                      counters=('hits', 'misses', 'not_modified'))
+
+
+def _to_json(value):
+    """Converts the values json can't serialise itself (e.g. NumPy numbers and arrays)
+
+    :param value The value to convert"""
+
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def encode(data):
+    """Returns a dictionary from each supported content encoding ('identity', 'gzip' and 'br') to the compact JSON
+    serialisation of the given data in that encoding
+
+    :param data The data to serialise"""
+
+    body = json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_to_json).encode('utf-8')
+    bodies = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        bodies['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body)
+    return bodies
+
+
+def choose_encoding(bodies):
+    """Returns the smallest encoding of the response that the client accepts
+
+    :param bodies The dictionary of encoded bodies (from encode())"""
+
+    accepted = [x for x in bodies if x == 'identity' or request.accept_encodings[x] > 0]
+    return min(accepted, key=lambda x: len(bodies[x]))
+
+
+def cached_json(view):
+    """Decorator that serves the data returned by a Flask view as JSON, caching the encoded response until the data
+    changes. Views signal errors with abort(), so errors are never cached
+
+    :param view The view function, returning the data to serialise"""
+
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        version, last_modified = sheet_cache.data_version()
+        key = (request.endpoint, tuple(sorted(kwargs.items())), version)
+
+        # Serialise and compress the data if it isn't cached
+        entry = _responses.get(key)
+        _responses.count("misses" if entry is None else "hits")
+        if entry is None:
+            bodies = encode(view(**kwargs))
+            etag = f"{version}-{hashlib.sha1(bodies['identity']).hexdigest()[:16]}"
+            entry = (bodies, etag, datetime.fromtimestamp(int(last_modified), timezone.utc))
+            _responses.put(key, entry)
+
+        # Build a fresh response in the client's encoding, answering with a 304 if the client's copy is current. Each
+        # encoding has its own ETag, since the bytes differ
+        bodies, etag, last_modified = entry
+        encoding = choose_encoding(bodies)
+        response = Response(bodies[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+            etag = f"{etag}-{encoding}"
+        response.vary.add('Accept-Encoding')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            _responses.count("not_modified")
+        return response
+
+    return wrapper
+
+
+def clear():
+    """Removes every response from the cache"""
+
+    _responses.clear()
+
+
+def cache_stats():
+    """Returns a dictionary containing the number of cache hits, misses, 304 responses and evictions, along with the
+    number of responses and bytes currently cached"""
+
+    stats = _responses.stats()
+    stats["cached_responses"] = stats.pop("items")
+    stats["cached_bytes"] = stats.pop("bytes")
+    return stats
@@ -0,0 +1,79 @@
+"""Module containing the bounded, thread-safe LRU store shared by the page, chart and JSON caches. Each store holds its
+values in least recently used order, evicts from the front once it is over its limits, and keeps the hit/miss
+counters reported by its cache's cache_stats()"""
+
+from collections import OrderedDict
+import threading
+
+
+class LRUStore:
+    """Least recently used store with limits on the number of values and their total size
+
+    :param max_items The maximum number of values held, or None for no limit
+    :param max_bytes The maximum total size of the values held, or None for no limit
+    :param size A function returning the size in bytes of a value
+    :param counters The names of the counters reported by stats(), e.g. 'hits' and 'misses'. 'evictions' is always
+    counted"""
+
+    def __init__(self, max_items=None, max_bytes=None, size=len, counters=()):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._value_size = size
+        self._values = OrderedDict()
+        self._bytes = 0
+        self._counters = dict.fromkeys(list(counters) + ['evictions'], 0)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value with the given key (marking it as recently used), or None if it isn't held
+
+        :param key The key of the value"""
+
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Adds a value to the store, evicting the least recently used values if the store is over its limits
+
+        :param key The key of the value
+        :param value The value to add"""
+
+        with self._lock:
+            if key in self._values:
+                self._bytes -= self._value_size(self._values.pop(key))
+            self._values[key] = value
+            self._bytes += self._value_size(value)
+
+            while self._values and ((self.max_items is not None and len(self._values) > self.max_items) or
+                                    (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, evicted = self._values.popitem(last=False)
+                self._bytes -= self._value_size(evicted)
+                self._counters['evictions'] += 1
+
+    def count(self, counter):
+        """Adds one to the given counter
+
+        :param counter The name of the counter (one of the counters given to the constructor)"""
+
+        with self._lock:
+            self._counters[counter] += 1
+
+    def clear(self):
+        """Removes every value from the store. The counters are kept"""
+
+        with self._lock:
+            self._values.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns a dictionary of the counters, along with the number of values ('items') and their total size in
+        bytes ('bytes')"""
+
+        with self._lock:
+            stats = dict(self._counters)
+            stats['items'] = len(self._values)
+            stats['bytes'] = self._bytes
+        return stats
@@ -0,0 +1,74 @@
+"""Module containing a cache of rendered pages. Pages are keyed on the route, its arguments and the data version, so a
+page is only rendered once per data update. Cached pages are served with ETag and Last-Modified headers, so browsers
+that already have the page get a 304 response"""
+
+from datetime import datetime, timezone
+from flask import request, make_response, Response
+import functools
+import hashlib
+import sheet_cache
+from lru_store import LRUStore
+
+# Limits on the number of pages and the total size of the pages in the cache. The least recently used pages are
+# evicted first
+MAX_PAGES = 512
+MAX_BYTES = 64 * 1024 * 1024
+
+# Cached pages, keyed by (endpoint, view arguments, data version), along with the hit/miss counters used to check the
+# cache is working. Each value is a tuple of the form (body, mimetype, etag, last_modified)
+_pages = LRUStore(MAX_PAGES, MAX_BYTES, size=lambda entry: len(entry[0]), counters=('hits', 'misses', 'not_modified'))
+
+
+def cached_page(view):
+    """Decorator that caches the response of a Flask view until the data changes. Only successful responses are
+    cached, so errors are always re-rendered
+
+    :param view The view function to cache"""
+
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        version, last_modified = sheet_cache.data_version()
+        key = (request.endpoint, tuple(sorted(kwargs.items())), version)
+
+        # Render the page if it isn't cached
+        entry = _pages.get(key)
+        _pages.count("misses" if entry is None else "hits")
+        if entry is None:
+            response = make_response(view(**kwargs))
+            if response.status_code != 200:
+                return response
+
+            body = response.get_data()
+            etag = f"{version}-{hashlib.sha1(body).hexdigest()[:16]}"
+            entry = (body, response.mimetype, etag, datetime.fromtimestamp(int(last_modified), timezone.utc))
+            _pages.put(key, entry)
+
+        # Build a fresh response from the cached page, answering with a 304 if the browser's copy is current
+        body, mimetype, etag, last_modified = entry
+        response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            _pages.count("not_modified")
+        return response
+
+    return wrapper
+
+
+def clear():
+    """Removes every page from the cache"""
+
+    _pages.clear()
+
+
+def cache_stats():
+    """Returns a dictionary containing the number of cache hits, misses, 304 responses and evictions, along with the
+    number of pages and bytes currently cached"""
+
+    stats = _pages.stats()
+    stats["cached_pages"] = stats.pop("items")
+    stats["cached_bytes"] = stats.pop("bytes")
+    return stats
@@ -0,0 +1,110 @@
+"""Module containing the player registry, an index of every player on the TotalStats sheet. The registry is built once
+per version of the TotalStats sheet and gives constant time lookups between player numbers, names and rows"""
+
+import numpy as np
+import sheet_cache
+
+
+class PlayerRegistry:
+    """Index of the players on the TotalStats sheet
+
+    :param total_stats_df The dataframe to build the registry from (in this case we will have total_stats_df = get_sheet_df('TotalStats')"""
+
+    def __init__(self, total_stats_df):
+        numbers = total_stats_df['Player Number'].astype(int).to_numpy()
+        names = list(total_stats_df['Player Name'])
+
+        # Arrays of the player numbers, names and roles in sheet order
+        self.player_numbers = numbers
+        self.player_names = np.array(names, dtype=object)
+        self.player_roles = np.array(list(total_stats_df['Player Role']), dtype=object)
+
+        # Dictionaries for single lookups. Some names appear on the sheet more than once, so those map to the first row
+        # with that name, as list.index() did
+        self.number_to_name = dict(zip(numbers.tolist(), names))
+        self.name_to_row = {}
+        for row, name in enumerate(names):
+            self.name_to_row.setdefault(name, row)
+        self.name_to_number = {name: int(numbers[row]) for name, row in self.name_to_row.items()}
+        self.number_to_row = {number: row for row, number in enumerate(numbers.tolist())}
+
+        # Lookup tables indexed by player number for bulk lookups. Row -1 marks numbers that aren't on the sheet
+        size = int(numbers.max()) + 1 if len(numbers) else 1
+        self._rows_by_number = np.full(size, -1, dtype=np.int64)
+        self._rows_by_number[numbers] = np.arange(len(numbers))
+
+    def __len__(self):
+        return len(self.player_numbers)
+
+    def __contains__(self, player_name):
+        return player_name in self.name_to_row
+
+    def name(self, number):
+        """Returns the name of the player with the given number
+
+        :param number The Player Number to get the name of"""
+
+        try:
+            return self.number_to_name[int(number)]
+        except KeyError:
+            raise Exception(f"A Player with number {number} was not found. Check the player number matches one on the sheet")
+
+    def number(self, player_name):
+        """Returns the number of the player with the given name
+
+        :param player_name The Player Name to get the number of"""
+
+        try:
+            return self.name_to_number[player_name]
+        except KeyError:
+            raise Exception(f"The player {player_name} was not found. Check the player name matches one on the sheet")
+
+    def row(self, player_name):
+        """Returns the row index of the given player in the TotalStats sheet (and the weekly sheets, which share its order)
+
+        :param player_name The Player Name to get the row of"""
+
+        try:
+            return self.name_to_row[player_name]
+        except KeyError:
+            raise Exception(f"Couldn't find '{player_name}' on the TotalStats spreadsheet")
+
+    def rows(self, numbers):
+        """Returns an array of the row indices of the players with the given numbers
+
+        :param numbers The list (or array) of Player Numbers to get the rows of"""
+
+        numbers = np.asarray(numbers, dtype=np.int64)
+
+        # Numbers outside the lookup table are treated as missing
+        in_range = (numbers >= 0) & (numbers < len(self._rows_by_number))
+        rows = np.full(numbers.shape, -1, dtype=np.int64)
+        rows[in_range] = self._rows_by_number[numbers[in_range]]
+
+        # Throw an exception for the first number that wasn't found
+        missing = rows < 0
+        if missing.any():
+            number = numbers[missing][0]
+            raise Exception(f"A Player with number {number} was not found. Check the player number matches one on the sheet")
+        return rows
+
+    def names(self, numbers):
+        """Returns an array of the names of the players with the given numbers
+
+        :param numbers The list (or array) of Player Numbers to get the names of"""
+
+        return self.player_names[self.rows(numbers)]
+
+    def numbers(self, player_names):
+        """Returns an array of the numbers of the players with the given names
+
+        :param player_names The list of Player Names to get the numbers of"""
+
+        return np.array([self.number(name) for name in player_names], dtype=np.int64)
+
+
+def get_player_registry():
+    """Returns the player registry for the current version of the TotalStats sheet"""
+
+    return sheet_cache.get_derived('player_registry', ['TotalStats'],
+                                   lambda: PlayerRegistry(sheet_cache.get_sheet('TotalStats')))
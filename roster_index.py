@@ -0,0 +1,60 @@
+"""Module containing the roster index, an inverted index from each player number to the teams that picked that player.
+The index is built once per version of the TeamList sheet, so finding a player's picks is a single lookup"""
+
+from collections import Counter
+import sheet_cache
+
+# The roster slots on the TeamList sheet, in the order they appear
+ROSTER_SLOTS = ['Batsman 1', 'Batsman 2', 'Batsman 3', 'Batsman 4', 'All-Rounder 1', 'All-Rounder 2', 'All-Rounder 3',
+                'Wicket-keeper', 'Bowler 1', 'Bowler 2', 'Bowler 3']
+
+
+class RosterIndex:
+    """Inverted index of the team rosters on the TeamList sheet
+
+    :param team_list_df The dataframe to build the index from (in this case we will have team_list_df = get_sheet_df('TeamList')"""
+
+    def __init__(self, team_list_df):
+        team_names = list(team_list_df['Team Name'])
+        team_owners = list(team_list_df['Team Owner'])
+        rosters = team_list_df[ROSTER_SLOTS].astype(int).to_numpy()
+
+        # Map each player number to a list of tuples of the form (team_name, team_owner, roster_slot)
+        self.picks_by_number = {}
+        for team_name, team_owner, roster in zip(team_names, team_owners, rosters.tolist()):
+            for slot, number in zip(ROSTER_SLOTS, roster):
+                self.picks_by_number.setdefault(number, []).append((team_name, team_owner, slot))
+
+        # Count the picks of each player
+        self.pick_counts = Counter({number: len(picks) for number, picks in self.picks_by_number.items()})
+
+    def picks(self, number):
+        """Returns a list of tuples of the form (team_name, team_owner, roster_slot), one for each team that picked the
+        player with the given number
+
+        :param number The Player Number to get the picks of"""
+
+        return self.picks_by_number.get(int(number), [])
+
+    def pick_count(self, number):
+        """Returns the number of teams that picked the player with the given number
+
+        :param number The Player Number to get the pick count of"""
+
+        return self.pick_counts.get(int(number), 0)
+
+    def most_picked(self, n=None):
+        """Returns a list of tuples of the form (player_number, picks) for the n most picked players, in descending
+        order of picks (ties are broken by player number). Returns every picked player if n is not given
+
+        :param n The number of players to return"""
+
+        ranking = sorted(self.pick_counts.items(), key=lambda x: (-x[1], x[0]))
+        return ranking if n is None else ranking[:n]
+
+
+def get_roster_index():
+    """Returns the roster index for the current version of the TeamList sheet"""
+
+    return sheet_cache.get_derived('roster_index', ['TeamList'],
+                                   lambda: RosterIndex(sheet_cache.get_sheet('TeamList')))
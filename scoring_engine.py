@@ -0,0 +1,214 @@
+"""Module containing the scoring engine, which calculates the BATTING, BOWLING, FIELDING, BONUS and TOTAL points columns
+from the raw stat columns, in the same way as the formulas on the points sheet. The rules are stored in a table which is
+also used to generate the points calculator on the About page. Run it as a script to recalculate the season and check it
+against the sheets in the data folder"""
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# A scoring rule. action and points are what the About page shows, category is the points column the rule adds to, and
+# stat is either the stat column that is multiplied by points, or a function that calculates the points from a
+# function returning the array of a given stat column
+ScoringRule = namedtuple('ScoringRule', ['action', 'category', 'points', 'stat'])
+
+
+def six_plus_fer_points(stat):
+    """Returns the points for 6+fers: 60, plus 15 for every wicket above 5
+
+    :param stat A function that returns the array of the given stat column"""
+
+    return 60 * stat('6+fers') + 15 * np.maximum(stat('WICKETS') - 5, 0) * (stat('6+fers') > 0)
+
+
+def economy_points(stat):
+    """Returns the economy points: the number of balls bowled minus half of the runs against
+
+    :param stat A function that returns the array of the given stat column"""
+
+    return stat('BALLS') - 0.5 * stat('RUNS AGAINST')
+
+
+# The scoring rules, in the order they are shown on the About page
+POINTS_RULES = [
+    ScoringRule('Run', 'BATTING', 2.5, 'RUNS'),
+    ScoringRule('4', 'BATTING', 2, '4s'),
+    ScoringRule('6', 'BATTING', 4, '6s'),
+    ScoringRule('50', 'BATTING', 30, '50s'),
+    ScoringRule('100', 'BATTING', 60, '100s'),
+    ScoringRule('150', 'BATTING', 90, '150s'),
+    ScoringRule('200', 'BATTING', 120, '200s'),
+    ScoringRule('Duck', 'BATTING', -15, 'DUCKS'),
+    ScoringRule('Wicket', 'BOWLING', 20, 'WICKETS'),
+    ScoringRule('3fer', 'BOWLING', 30, '3fers/4fers'),
+    ScoringRule('5fer', 'BOWLING', 60, '5fers'),
+    ScoringRule('6+fer', 'BOWLING', '60 + 15*(num. wickets above 5)', six_plus_fer_points),
+    ScoringRule('Economy', 'BOWLING', 'balls bowled - 0.5*(runs against)', economy_points),
+    ScoringRule('Maiden', 'BOWLING', 10, 'MAIDENS'),
+    ScoringRule('Catch', 'FIELDING', 15, 'CATCHES'),
+    ScoringRule('Run-out', 'FIELDING', 15, 'RUN-OUTS'),
+    ScoringRule('Stumping', 'FIELDING', 15, 'STUMPINGS'),
+    ScoringRule('Match Win', 'BONUS', 10, 'WINS'),
+    ScoringRule('MOTM', 'BONUS', 25, 'MOTM'),
+]
+
+# The points columns, in the order they appear on the sheets
+CATEGORIES = ['BATTING', 'BOWLING', 'FIELDING', 'BONUS']
+POINTS_COLUMNS = CATEGORIES + ['TOTAL']
+
+
+def score(stats_array, stats, rules=POINTS_RULES):
+    """Returns an array of shape (..., 5) of the BATTING, BOWLING, FIELDING, BONUS and TOTAL points for the given stats.
+    Any number of leading axes are supported, so a whole season of shape (player, week, stat) is scored at once
+
+    :param stats_array An array whose last axis is the stat axis
+    :param stats The list of stat column names along the last axis of stats_array
+    :param rules The list of scoring rules to apply"""
+
+    stats_array = np.asarray(stats_array, dtype=np.float64)
+    stat_index = {x: i for i, x in enumerate(stats)}
+
+    def stat(name):
+        return stats_array[..., stat_index[name]]
+
+    # Rules that multiply a stat column by a fixed number of points become one weight matrix of shape (stat, category),
+    # so they are all applied in a single matrix product
+    weights = np.zeros((len(stats), len(CATEGORIES)))
+    formula_rules = []
+    for rule in rules:
+        if callable(rule.stat):
+            formula_rules.append(rule)
+        else:
+            weights[stat_index[rule.stat], CATEGORIES.index(rule.category)] += rule.points
+
+    points = np.zeros(stats_array.shape[:-1] + (len(POINTS_COLUMNS),))
+    points[..., :len(CATEGORIES)] = stats_array @ weights
+
+    # Apply the rules that need a formula
+    for rule in formula_rules:
+        points[..., CATEGORIES.index(rule.category)] += rule.stat(stat)
+
+    points[..., -1] = points[..., :len(CATEGORIES)].sum(axis=-1)
+    return points
+
+
+def score_season(store):
+    """Returns a tuple (weekly, season). weekly is an array of shape (player, week, 5) of each player's points columns in
+    each week, and season is an array of shape (player, 5) of their points columns for the whole season
+
+    :param store The season store holding the weekly stats (from season_store.get_season_store())"""
+
+    weekly = score(store.points, store.stats)
+
+    # Milestone bonuses depend on single matches, so the season points are the sum of the weekly points
+    return weekly, weekly.sum(axis=1)
+
+
+def overs_to_balls(overs):
+    """Returns an array of the number of balls in the given overs, where the decimal part of each over is the number of
+    balls in the unfinished over (e.g 3.4 overs is 22 balls)
+
+    :param overs The array of overs"""
+
+    overs = np.asarray(overs, dtype=np.float64)
+    whole_overs = np.floor(overs + 1e-9)
+    return 6 * whole_overs + np.round((overs - whole_overs) * 10)
+
+
+def match_stats(bat_df, bowl_df, field_df, warwick_win=False, motm=None):
+    """Returns a dataframe of the stats each player earned in a single match, indexed by player name and with one column
+    for each stat on the weekly sheets. The stats are derived in the same way as write_google_sheets.update_stats
+
+    :param bat_df The cleaned batting dataframe, obtained from the function read_play_cricket.clean_scorecards()
+    :param bowl_df The cleaned bowling dataframe, obtained from the function read_play_cricket.clean_scorecards()
+    :param field_df The cleaned fielding dataframe, obtained from the function read_play_cricket.clean_scorecards()
+    :param warwick_win Whether Warwick won the match (every batsman gets the win bonus)
+    :param motm The name of the Man of the Match, or None"""
+
+    frames = []
+
+    # Batting stats, along with milestones and the match win
+    if not bat_df.empty:
+        runs = pd.to_numeric(bat_df['RUNS'], errors='coerce').fillna(0).to_numpy()
+        frames.append(pd.DataFrame({
+            'GAMES': 1, 'RUNS': runs,
+            '4s': pd.to_numeric(bat_df['4s'], errors='coerce').fillna(0).to_numpy(),
+            '6s': pd.to_numeric(bat_df['6s'], errors='coerce').fillna(0).to_numpy(),
+            '50s': (50 <= runs) & (runs < 100), '100s': (100 <= runs) & (runs < 150),
+            '150s': (150 <= runs) & (runs < 200), '200s': runs >= 200,
+            'WINS': int(bool(warwick_win))}, index=list(bat_df['BATSMAN'])))
+
+    # Bowling stats, along with 3fers/4fers, 5fers and 6+fers
+    if not bowl_df.empty:
+        overs = pd.to_numeric(bowl_df['OVERS'], errors='coerce').fillna(0).to_numpy()
+        wickets = pd.to_numeric(bowl_df['WICKETS'], errors='coerce').fillna(0).to_numpy()
+        frames.append(pd.DataFrame({
+            'OVERS': overs, 'BALLS': overs_to_balls(overs), 'WICKETS': wickets,
+            'RUNS AGAINST': pd.to_numeric(bowl_df['RUNS'], errors='coerce').fillna(0).to_numpy(),
+            'MAIDENS': pd.to_numeric(bowl_df['MAIDENS'], errors='coerce').fillna(0).to_numpy(),
+            '3fers/4fers': (3 <= wickets) & (wickets <= 4), '5fers': wickets == 5, '6+fers': wickets >= 6},
+            index=list(bowl_df['BOWLER'])))
+
+    # Fielding stats
+    if not field_df.empty:
+        frames.append(pd.DataFrame({'CATCHES': field_df['Catches'].to_numpy(), 'RUN-OUTS': field_df['Run-outs'].to_numpy(),
+                                    'STUMPINGS': field_df['Stumpings'].to_numpy()}, index=list(field_df['Fielder'])))
+
+    # Man of the Match
+    if motm is not None:
+        frames.append(pd.DataFrame({'MOTM': [1]}, index=[motm]))
+
+    # Combine the stats of players who appear in more than one dataframe
+    if not frames:
+        return pd.DataFrame()
+    stats = pd.concat(frames).astype(float).fillna(0)
+    return stats.groupby(level=0, sort=False).sum()
+
+
+def validate(store, total_stats_df, tolerance=1e-6):
+    """Recalculates the points columns for the whole season and returns a dataframe of every cell that doesn't match the
+    sheets, with the columns Sheet, Player Name, Column, Sheet Value and Calculated Value. The dataframe is empty if every
+    cell matches
+
+    :param store The season store holding the weekly stats (from season_store.get_season_store())
+    :param total_stats_df The TotalStats dataframe
+    :param tolerance The largest difference that is treated as a match"""
+
+    weekly, season = score_season(store)
+    points_index = store.stat_index(POINTS_COLUMNS)
+
+    # Line the TotalStats rows up with the season store's players
+    total_stats = total_stats_df.set_index('Player Number').reindex(store.player_numbers)[POINTS_COLUMNS]
+    total_stats = total_stats.apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy()
+
+    # Compare each sheet's points columns with the calculated ones
+    comparisons = [(week, store.points[:, i][:, points_index], weekly[:, i]) for i, week in enumerate(store.weeks)]
+    comparisons.append(('TotalStats', total_stats, season))
+
+    mismatches = []
+    for sheet, sheet_values, calculated in comparisons:
+        rows, columns = np.nonzero(np.abs(sheet_values - calculated) > tolerance)
+        for row, column in zip(rows, columns):
+            mismatches.append((sheet, store.player_names[row], POINTS_COLUMNS[column],
+                               sheet_values[row, column], calculated[row, column]))
+
+    return pd.DataFrame(mismatches, columns=['Sheet', 'Player Name', 'Column', 'Sheet Value', 'Calculated Value'])
+
+
+if __name__ == "__main__":
+    import time
+    import sheet_cache
+    from season_store import get_season_store
+
+    store = get_season_store()
+    start = time.perf_counter()
+    score_season(store)
+    seconds = time.perf_counter() - start
+
+    mismatches = validate(store, sheet_cache.get_sheet('TotalStats'))
+    print(f"Scored {len(store.player_numbers)} players over {len(store.weeks)} weeks in {seconds * 1000:.2f}ms")
+    if mismatches.empty:
+        print("Every points column matches the sheets")
+    else:
+        print(f"{len(mismatches)} cells don't match the sheets:")
+        print(mismatches.to_string(index=False))
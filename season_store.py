@@ -0,0 +1,169 @@
+"""Module containing the season store, which holds every weekly sheet in a single NumPy array of shape
+(player, week, stat). The store is built once per version of the weekly sheets, and the per-player, per-week and
+per-stat views are slices of the array rather than copies"""
+
+import numpy as np
+import pandas as pd
+import sheet_cache
+import snapshot
+
+# The weekly sheets, in order
+WEEK_SHEETS = [f"Week{i}" for i in range(1, 11)]
+
+# The columns identifying each player on the weekly sheets. Every other column is a stat
+PLAYER_COLUMNS = ['Player Number', 'Player Name', 'Player Role']
+
+# The points columns, one for each category
+CATEGORY_COLUMNS = ['BATTING', 'BOWLING', 'FIELDING', 'BONUS']
+
+
+class SeasonStore:
+    """Array of every stat for every player in every week. The axes are named by the attributes players, weeks and
+    stats, so points[i, j, k] is the value of stats[k] for player_numbers[i] in weeks[j]
+
+    :param player_numbers The Player Numbers along the player axis
+    :param player_names The Player Names along the player axis
+    :param player_roles The Player Roles along the player axis
+    :param weeks The week names along the week axis
+    :param stats The stat column names along the stat axis
+    :param points The array of shape (player, week, stat)"""
+
+    def __init__(self, player_numbers, player_names, player_roles, weeks, stats, points):
+        # Axis labels
+        self.player_numbers = np.asarray(player_numbers, dtype=np.int64)
+        self.player_names = np.array(list(player_names), dtype=object)
+        self.player_roles = np.array(list(player_roles), dtype=object)
+        self.weeks = list(weeks)
+        self.stats = list(stats)
+
+        # The array is shared by every request, so make sure nothing writes to it
+        self.points = points
+        if self.points.flags.writeable:
+            self.points.flags.writeable = False
+
+        # Lookups from each axis label to its index. Players are looked up by number, since the weekly sheets don't
+        # always spell names the same way as TotalStats (names should be resolved with the player registry)
+        self._player_index = {number: i for i, number in enumerate(self.player_numbers.tolist())}
+        self._week_index = {week: i for i, week in enumerate(self.weeks)}
+        self._stat_index = {stat: i for i, stat in enumerate(self.stats)}
+
+    @classmethod
+    def from_dataframes(cls, week_dfs, weeks=WEEK_SHEETS):
+        """Returns a season store built from the weekly dataframes
+
+        :param week_dfs The list of weekly dataframes to build the store from (Week1, Week2, ..., Week10)
+        :param weeks The list of week names, in the same order as week_dfs"""
+
+        # Player axis, in the order of the first weekly sheet (which matches TotalStats)
+        first_week = week_dfs[0]
+        player_numbers = first_week['Player Number'].astype(int).to_numpy()
+        stats = [x for x in first_week.columns if x not in PLAYER_COLUMNS]
+
+        # Fill the array one week at a time. Blank cells on the sheets mean the player didn't play, so they become 0s
+        points = np.zeros((len(player_numbers), len(weeks), len(stats)), dtype=np.float64)
+        for i, week_df in enumerate(week_dfs):
+            week_df = week_df.set_index('Player Number').reindex(player_numbers)
+            points[:, i, :] = week_df[stats].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy()
+
+        return cls(player_numbers, first_week['Player Name'], first_week['Player Role'], weeks, stats, points)
+
+    def player_index(self, player_number):
+        """Returns the index of the player with the given number on the player axis
+
+        :param player_number The Player Number to get the index of"""
+
+        if int(player_number) in self._player_index:
+            return self._player_index[int(player_number)]
+        else:
+            raise Exception(f"Couldn't find a player with number {player_number} on the weekly spreadsheets")
+
+    def player_rows(self, player_numbers):
+        """Returns an array of the indices of the players with the given numbers on the player axis
+
+        :param player_numbers The list (or array) of Player Numbers to get the indices of"""
+
+        return np.array([self.player_index(x) for x in np.asarray(player_numbers).ravel().tolist()],
+                        dtype=np.int64).reshape(np.shape(player_numbers))
+
+    def week_index(self, week):
+        """Returns the index of the given week on the week axis
+
+        :param week The week name (e.g 'Week1') or week number (e.g 1) to get the index of"""
+
+        if not isinstance(week, str):
+            week = f"Week{week}"
+        if week in self._week_index:
+            return self._week_index[week]
+        else:
+            raise Exception(f"Couldn't find '{week}' in the season store")
+
+    def stat_index(self, stat):
+        """Returns the index of the given stat on the stat axis, or a list of indices if a list of stats is given
+
+        :param stat The stat column name (e.g 'TOTAL'), or a list of stat column names"""
+
+        if isinstance(stat, (list, tuple)):
+            return [self.stat_index(x) for x in stat]
+        if stat in self._stat_index:
+            return self._stat_index[stat]
+        else:
+            raise Exception(f"Couldn't find the stat '{stat}' in the season store")
+
+    def player(self, player_number):
+        """Returns a (week, stat) view of the stats of the player with the given number
+
+        :param player_number The Player Number to get the stats of (e.g. from player_registry.get_player_registry().number(name))"""
+
+        return self.points[self.player_index(player_number)]
+
+    def week(self, week):
+        """Returns a (player, stat) view of the stats of every player in the given week
+
+        :param week The week name (e.g 'Week1') or week number (e.g 1)"""
+
+        return self.points[:, self.week_index(week)]
+
+    def stat(self, stat):
+        """Returns a (player, week) view of the given stat for every player
+
+        :param stat The stat column name (e.g 'TOTAL')"""
+
+        return self.points[:, :, self.stat_index(stat)]
+
+    def team(self, rows):
+        """Returns a (slot, week, stat) array of the stats of the players in the given rows. Since a team's players
+        aren't next to each other on the player axis this is a gather rather than a view
+
+        :param rows The list (or array) of player rows, e.g. from player_rows(numbers)"""
+
+        return self.points[np.asarray(rows)]
+
+    def week_frame(self, week):
+        """Returns the given week as a dataframe, in the same layout as the weekly sheets
+
+        :param week The week name (e.g 'Week1') or week number (e.g 1)"""
+
+        df = pd.DataFrame(self.week(week), columns=self.stats)
+        df.insert(0, 'Player Number', self.player_numbers)
+        df.insert(1, 'Player Name', self.player_names)
+        df.insert(2, 'Player Role', self.player_roles)
+        return df
+
+
+def load_season_store():
+    """Returns a new season store, memory-mapping the snapshot if it is up to date and parsing the weekly sheets
+    otherwise"""
+
+    season = snapshot.read_season(sheet_cache.current_dir(), WEEK_SHEETS)
+    if season is not None:
+        points, axes = season
+        return SeasonStore(axes['player_numbers'], axes['player_names'], axes['player_roles'],
+                           axes['weeks'], axes['stats'], points)
+
+    return SeasonStore.from_dataframes([sheet_cache.get_sheet(week) for week in WEEK_SHEETS])
+
+
+def get_season_store():
+    """Returns the season store for the current version of the weekly sheets"""
+
+    return sheet_cache.get_derived('season_store', WEEK_SHEETS, load_season_store)
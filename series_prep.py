@@ -0,0 +1,43 @@
+"""Module containing the series preparation used by the line graphs. Each function works on a whole matrix of weekly
+series at once (one series per row, e.g. every team or every player), with the weeks along the last axis"""
+
+import numpy as np
+
+
+def cumulative(series):
+    """Returns the cumulative sums of the given series
+
+    :param series An array of weekly values, with the weeks along the last axis"""
+
+    return np.cumsum(np.asarray(series), axis=-1)
+
+
+def trailing_zeros(series):
+    """Returns the number of trailing zeros in each of the given series, e.g [1,2,3,4,0,0,0] would give 3. A series
+    that is all zeros has as many trailing zeros as it has weeks
+
+    :param series An array of weekly values, with the weeks along the last axis"""
+
+    # The first non-zero value of the reversed series is the last week played
+    played = np.flip(np.asarray(series) != 0, axis=-1)
+    return np.where(played.any(axis=-1), played.argmax(axis=-1), played.shape[-1])
+
+
+def played_weeks(series):
+    """Returns the number of weeks up to the last week in which any of the given series has a non-zero value
+
+    :param series An array of weekly values, with the weeks along the last axis"""
+
+    series = np.asarray(series)
+    if series.size == 0:
+        return 0
+    return int(series.shape[-1] - trailing_zeros(series).min())
+
+
+def cumulative_to_date(series):
+    """Returns the cumulative sums of the given series, with the weeks after the last week played by any of them
+    removed
+
+    :param series An array of weekly values, with the weeks along the last axis"""
+
+    return cumulative(series)[..., :played_weeks(series)]
@@ -0,0 +1,199 @@
+"""Module containing a process-wide cache of the sheets in the data folder. Each sheet is loaded once and the same
+dataframe is returned until the file's modification time or size changes. When versions of the data have been
+published (see data_versions.py), the sheets are read from the version folder this process is serving, and each
+request stays pinned to the folder it started with"""
+
+import pandas as pd
+import snapshot
+import contextvars
+import threading
+import hashlib
+import os
+
+# Folder containing the downloaded sheets
+DATA_DIR = "data"
+
+# File in the data folder naming the published version to serve, and the folder the versions are kept in
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+# The number of published versions kept on disk, along with the charts drawn from them
+KEEP_VERSIONS = 3
+
+# The data folder this process is serving, and the folder pinned by the request being handled (if any)
+_active_dir = None
+_pinned_dir = contextvars.ContextVar('pinned_data_dir', default=None)
+
+# Cached sheets, keyed by file path. Each value is a tuple of the form (mtime, size, dataframe)
+_sheets = {}
+
+# Structures derived from the sheets (e.g. indexes), keyed by (data folder, name). Each value is a tuple of the form
+# (sheet versions, structure)
+_derived = {}
+
+# Hit/miss counters, used to check the cache is working
+_stats = {"hits": 0, "misses": 0}
+
+# Lock guarding the cache, since gunicorn may serve requests from several threads
+_lock = threading.Lock()
+
+
+def published_dir():
+    """Returns the folder of the version named in the CURRENT file, or the data folder itself if no version has been
+    published"""
+
+    try:
+        with open(os.path.join(DATA_DIR, CURRENT_FILE)) as f:
+            version_dir = os.path.join(DATA_DIR, VERSIONS_DIR, f.read().strip())
+    except FileNotFoundError:
+        return DATA_DIR
+    return version_dir if os.path.isdir(version_dir) else DATA_DIR
+
+
+def active_dir():
+    """Returns the data folder this process is serving. It is the published folder when the process starts, and only
+    changes when data_versions.reload() switches it"""
+
+    global _active_dir
+
+    with _lock:
+        if _active_dir is None:
+            _active_dir = published_dir()
+        return _active_dir
+
+
+def set_active_dir(data_dir):
+    """Switches the data folder this process is serving. Cached sheets and structures of the old folder are kept, since
+    requests already pinned to it may still use them, but those of any older folder are dropped
+
+    :param data_dir The data folder to serve"""
+
+    global _active_dir
+
+    with _lock:
+        keep = {data_dir, _active_dir}
+        _active_dir = data_dir
+        for path in [x for x in _sheets if os.path.dirname(x) not in keep]:
+            del _sheets[path]
+        for key in [x for x in _derived if x[0] not in keep]:
+            del _derived[key]
+
+
+def current_dir():
+    """Returns the data folder of the request being handled, or the active data folder outside of a request"""
+
+    return _pinned_dir.get() or active_dir()
+
+
+def pin(data_dir=None):
+    """Pins the current context (e.g. a request) to the given data folder, so it keeps reading the same version even if
+    the process switches to a new one. Returns a token to pass to unpin()
+
+    :param data_dir The data folder to pin (defaults to the active data folder)"""
+
+    return _pinned_dir.set(data_dir or active_dir())
+
+
+def unpin(token):
+    """Undoes a call to pin()
+
+    :param token The token returned by pin()"""
+
+    _pinned_dir.reset(token)
+
+
+def sheet_path(sheet):
+    """Returns the path of the csv file of the given sheet
+
+    :param sheet The name of the sheet (name of the csv file without the extension '.csv')"""
+
+    return os.path.join(current_dir(), f"{sheet}.csv")
+
+
+def sheet_version(sheet):
+    """Returns a tuple (mtime, size) identifying the current version of the given sheet, or None if it doesn't exist
+
+    :param sheet The name of the sheet (name of the csv file without the extension '.csv')"""
+
+    try:
+        stat = os.stat(sheet_path(sheet))
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def data_version():
+    """Returns a tuple (version, last_modified). The version is a short string identifying the current version of
+    every sheet in the data folder, and last_modified is the latest modification time (in seconds) of those sheets"""
+
+    versions = [(sheet, sheet_version(sheet)) for sheet in snapshot.SHEETS]
+    version = hashlib.sha1(repr((current_dir(), versions)).encode()).hexdigest()[:16]
+    last_modified = max([x[0] for _, x in versions if x is not None], default=0) / 1e9
+    return version, last_modified
+
+
+def get_sheet(sheet):
+    """Returns the given sheet as a dataframe, parsing the csv file only if it changed since it was last read.
+    The returned dataframe is shared by every caller, so it must not be modified in place
+
+    :param sheet The name of the sheet (name of the csv file without the extension '.csv')"""
+
+    path = sheet_path(sheet)
+    version = sheet_version(sheet)
+    if version is None:
+        raise Exception(f"Oopsie, {sheet} doesn't exist")
+
+    # Return the cached dataframe if the file hasn't changed
+    with _lock:
+        cached = _sheets.get(path)
+        if cached is not None and cached[:2] == version:
+            _stats["hits"] += 1
+            return cached[2]
+        _stats["misses"] += 1
+
+    # Load the file outside the lock so other sheets can still be served. The binary snapshot is preferred when it
+    # is at least as new as the csv file
+    df = snapshot.read_sheet(os.path.dirname(path), sheet)
+    if df is None:
+        df = pd.read_csv(path)
+
+    with _lock:
+        _sheets[path] = (version[0], version[1], df)
+    return df
+
+
+def get_derived(name, sheets, build):
+    """Returns a structure derived from the given sheets, building it only once per version of those sheets. This
+    is used for indexes that would otherwise be rebuilt from the dataframes on every request
+
+    :param name The name of the derived structure (used as the cache key)
+    :param sheets The list of sheet names the structure is built from
+    :param build A function with no arguments that builds the structure"""
+
+    key = (current_dir(), name)
+    version = tuple(sheet_version(sheet) for sheet in sheets)
+
+    # Return the cached structure if none of the sheets have changed
+    with _lock:
+        cached = _derived.get(key)
+        if cached is not None and cached[0] == version:
+            _stats["hits"] += 1
+            return cached[1]
+        _stats["misses"] += 1
+
+    value = build()
+
+    with _lock:
+        _derived[key] = (version, value)
+    return value
+
+
+def cache_stats():
+    """Returns a dictionary containing the number of cache hits and misses, along with the number of
+    sheets and derived structures currently cached"""
+
+    with _lock:
+        stats = dict(_stats)
+        stats["cached_sheets"] = len(_sheets)
+        stats["cached_structures"] = len(_derived)
+    return stats
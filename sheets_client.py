@@ -0,0 +1,106 @@
+"""Module containing a shared, authorised Google Sheets client. The client, the spreadsheets it opens and their worksheets
+are created once per process and reused, so the HTTP session (and its keep-alive connections) is shared by every request,
+and the access token is only refreshed when it expires. Both the web app and the sheet updater use this module"""
+
+from requests.adapters import HTTPAdapter
+import requests
+import threading
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+
+# Define the scope of the application
+SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/spreadsheets',
+         'https://www.googleapis.com/auth/drive.file', 'https://www.googleapis.com/auth/drive']
+
+# The credentials file of the service account
+CREDENTIALS_FILE = 'google-credentials.json'
+
+# The Google Drive files endpoint, used to look up when a spreadsheet was last modified
+DRIVE_FILES_URL = 'https://www.googleapis.com/drive/v3/files/'
+
+# The spreadsheets used by the site
+STATS_SPREADSHEET = 'WarwickFantasyCricketPlayerStats'
+TEAM_SELECTION_SPREADSHEET = 'WarwickFantasyCricketTeamSelection'
+
+# The shared client, and the spreadsheets and worksheets it has opened
+_client = None
+_spreadsheets = {}
+_worksheets = {}
+
+# Lock guarding the shared client
+_lock = threading.RLock()
+
+
+def get_client():
+    """Returns the shared gspread client, authorising it the first time and refreshing its access token if it has expired"""
+
+    global _client
+
+    with _lock:
+        if _client is None:
+            # Add credentials to the account
+            creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPE)
+
+            # Use one pooled session for every request, so connections to Google are kept alive
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount('https://', adapter)
+
+            # Authorise the client
+            _client = gspread.Client(auth=creds, session=session)
+            _client.login()
+
+        # Refresh the access token only once it has expired
+        elif getattr(_client.auth, 'access_token_expired', False):
+            _client.login()
+
+        return _client
+
+
+def open_spreadsheet(title):
+    """Returns the spreadsheet with the given title, opening it only the first time it is requested
+
+    :param title The title of the spreadsheet (e.g 'WarwickFantasyCricketPlayerStats')"""
+
+    client = get_client()
+    with _lock:
+        if title not in _spreadsheets:
+            _spreadsheets[title] = client.open(title)
+        return _spreadsheets[title]
+
+
+def get_worksheet(title, index):
+    """Returns the worksheet at the given index of the spreadsheet with the given title, reusing the handle once it has
+    been fetched
+
+    :param title The title of the spreadsheet (e.g 'WarwickFantasyCricketPlayerStats')
+    :param index The index of the worksheet in the spreadsheet (e.g 0 for Week1)"""
+
+    spreadsheet = open_spreadsheet(title)
+    with _lock:
+        key = (title, index)
+        if key not in _worksheets:
+            _worksheets[key] = spreadsheet.get_worksheet(index)
+        return _worksheets[key]
+
+
+def get_modified_time(title):
+    """Returns the time the spreadsheet with the given title was last modified, as reported by Google Drive
+
+    :param title The title of the spreadsheet (e.g 'WarwickFantasyCricketPlayerStats')"""
+
+    spreadsheet = open_spreadsheet(title)
+    response = get_client().request('get', DRIVE_FILES_URL + spreadsheet.id,
+                                    params={'fields': 'modifiedTime', 'supportsAllDrives': True})
+    return response.json()['modifiedTime']
+
+
+def reset():
+    """Forgets the shared client and every spreadsheet and worksheet it opened, so the next request re-authorises"""
+
+    global _client
+
+    with _lock:
+        _client = None
+        _spreadsheets.clear()
+        _worksheets.clear()
@@ -0,0 +1,131 @@
+"""Module containing functions that compile the csv files in the data folder into a binary snapshot, and load them back.
+Each sheet is stored as a pickled dataframe, and the season store's points array is stored as a .npy file so that
+forked workers can memory-map one shared copy instead of each parsing the csv files"""
+
+import numpy as np
+import pandas as pd
+import json
+import os
+
+# The sheets in the data folder
+SHEETS = ["Week1", "Week2", "Week3", "Week4", "Week5", "Week6", "Week7", "Week8", "Week9", "Week10",
+          "TotalStats", "TeamList", "PlayerList"]
+
+
+def snapshot_dir(data_dir):
+    """Returns the path of the snapshot folder inside the given data folder
+
+    :param data_dir The data folder containing the csv files"""
+
+    return os.path.join(data_dir, "snapshot")
+
+
+def write_atomically(path, write):
+    """Writes a file by writing to a temporary file and renaming it, so readers never see a half-written file
+
+    :param path The path of the file to write
+    :param write A function that takes a path and writes the file there"""
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def _is_fresh(snapshot_path, source_paths):
+    """Returns True if the snapshot file exists and is at least as new as every one of its source files
+
+    :param snapshot_path The path of the snapshot file
+    :param source_paths The list of csv files the snapshot file was compiled from"""
+
+    try:
+        snapshot_mtime = os.stat(snapshot_path).st_mtime_ns
+        return all(os.stat(x).st_mtime_ns <= snapshot_mtime for x in source_paths)
+    except FileNotFoundError:
+        return False
+
+
+def write_snapshot(data_dir="data"):
+    """Compiles every csv file in the given data folder into the snapshot folder
+
+    :param data_dir The data folder containing the csv files"""
+
+    # Import here to avoid a circular import, since the season store loads snapshots through this module
+    from season_store import SeasonStore, WEEK_SHEETS
+
+    out_dir = snapshot_dir(data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Pickle each sheet
+    sheets = {}
+    for sheet in SHEETS:
+        csv_path = os.path.join(data_dir, f"{sheet}.csv")
+        if not os.path.exists(csv_path):
+            continue
+        sheets[sheet] = pd.read_csv(csv_path)
+        write_atomically(os.path.join(out_dir, f"{sheet}.pkl"), sheets[sheet].to_pickle)
+
+    # Save the season store's points array along with the labels of its axes
+    if all(week in sheets for week in WEEK_SHEETS):
+        store = SeasonStore.from_dataframes([sheets[week] for week in WEEK_SHEETS])
+        axes = {'player_numbers': store.player_numbers.tolist(), 'player_names': list(store.player_names),
+                'player_roles': list(store.player_roles), 'weeks': store.weeks, 'stats': store.stats}
+
+        def write_axes(path):
+            with open(path, 'w') as f:
+                json.dump(axes, f)
+
+        def write_points(path):
+            with open(path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(store.points))
+
+        # Write the axes first, since the points file's mtime is what marks the snapshot as fresh
+        write_atomically(os.path.join(out_dir, "season.json"), write_axes)
+        write_atomically(os.path.join(out_dir, "season.npy"), write_points)
+
+
+def read_sheet(data_dir, sheet):
+    """Returns the given sheet from the snapshot as a dataframe, or None if the snapshot is missing or older than the
+    csv file
+
+    :param data_dir The data folder containing the csv files
+    :param sheet The name of the sheet (name of the csv file without the extension '.csv')"""
+
+    pickle_path = os.path.join(snapshot_dir(data_dir), f"{sheet}.pkl")
+    if not _is_fresh(pickle_path, [os.path.join(data_dir, f"{sheet}.csv")]):
+        return None
+
+    # Fall back to the csv file if the pickle can't be read (e.g. it was written by a different pandas version)
+    try:
+        return pd.read_pickle(pickle_path)
+    except Exception:
+        return None
+
+
+def read_season(data_dir, weeks):
+    """Returns a tuple (points, axes) where points is the memory-mapped season array and axes is a dictionary of the
+    labels of its axes. Returns None if the snapshot is missing or older than any of the weekly csv files
+
+    :param data_dir The data folder containing the csv files
+    :param weeks The list of weekly sheet names the season array was compiled from"""
+
+    points_path = os.path.join(snapshot_dir(data_dir), "season.npy")
+    axes_path = os.path.join(snapshot_dir(data_dir), "season.json")
+    if not _is_fresh(points_path, [os.path.join(data_dir, f"{week}.csv") for week in weeks]):
+        return None
+
+    try:
+        with open(axes_path) as f:
+            axes = json.load(f)
+        points = np.load(points_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    # Make sure the snapshot matches the weeks and axes it is being loaded for
+    if axes['weeks'] != list(weeks) or points.shape != (len(axes['player_numbers']), len(weeks), len(axes['stats'])):
+        return None
+    return points, axes
+
+
+if __name__ == "__main__":
+    write_snapshot()
+    print("Snapshot written")
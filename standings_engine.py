@@ -0,0 +1,133 @@
+"""Module containing the incremental standings engine. When a single match is ingested, only the weekly points of the
+players in that match are rescored, only the teams that picked those players have their totals updated, and only those
+teams are moved in the league table"""
+
+from bisect import bisect_left, insort
+import threading
+import numpy as np
+import pandas as pd
+import sheet_cache
+from player_registry import get_player_registry
+from roster_index import ROSTER_SLOTS
+from scoring_engine import score, match_stats, POINTS_COLUMNS
+from season_store import get_season_store, WEEK_SHEETS
+
+
+class Standings:
+    """The league table, kept up to date one match at a time
+
+    :param store The season store holding the weekly stats (from season_store.get_season_store())
+    :param team_list_df The TeamList dataframe
+    :param registry The player registry (from player_registry.get_player_registry())"""
+
+    def __init__(self, store, team_list_df, registry):
+        self.registry = registry
+        self.stat_names = list(store.stats)
+        self.weeks = list(store.weeks)
+        self.team_names = [x.strip() for x in team_list_df['Team Name']]
+        self.team_owners = [x.strip() for x in team_list_df['Team Owner']]
+
+        # Private, writable copies of the weekly stats and each player's weekly total points
+        self.stats = np.array(store.points, dtype=np.float64)
+        self.player_points = self.stats[:, :, store.stat_index('TOTAL')].copy()
+
+        # Season store rows of each team's roster (looked up by Player Number, since the store and TotalStats may list
+        # players in different orders), and the inverse index from each player row to the teams that picked them
+        rosters = team_list_df[ROSTER_SLOTS].astype(int).to_numpy()
+        self.store = store
+        self.roster_rows = store.player_rows(rosters)
+        self.player_teams = {}
+        for team, rows in enumerate(self.roster_rows.tolist()):
+            for row in rows:
+                self.player_teams.setdefault(row, []).append(team)
+
+        # Each team's weekly and total points
+        self.team_week_points = self.player_points[self.roster_rows].sum(axis=1)
+        self.team_totals = self.team_week_points.sum(axis=1)
+
+        # The league table, kept as a sorted list of keys of the form (-total points, team index), so ties keep the
+        # TeamList order
+        self._order = sorted((-total, team) for team, total in enumerate(self.team_totals.tolist()))
+
+        # The standings are shared by every request, so matches are applied one at a time
+        self._lock = threading.RLock()
+
+    def positions(self):
+        """Returns a list of the team indices in league table order"""
+
+        with self._lock:
+            return [team for _, team in self._order]
+
+    def apply_match(self, week, bat_df, bowl_df, field_df, warwick_win=False, motm=None):
+        """Adds a single match's stats to the given week and updates the league table. Returns a dictionary with the keys
+        'players' (the names of the players whose points changed), 'teams' (a dictionary from each affected team name to
+        a tuple (old position, new position)) and 'unknown' (the names in the scorecards that aren't on the sheet)
+
+        :param week The week number the match belongs to
+        :param bat_df The cleaned batting dataframe, obtained from the function read_play_cricket.clean_scorecards()
+        :param bowl_df The cleaned bowling dataframe, obtained from the function read_play_cricket.clean_scorecards()
+        :param field_df The cleaned fielding dataframe, obtained from the function read_play_cricket.clean_scorecards()
+        :param warwick_win Whether Warwick won the match
+        :param motm The name of the Man of the Match, or None"""
+
+        week_index = self.weeks.index(f"Week{week}")
+
+        # Get the match's stats and look up the players' rows, skipping anyone who isn't on the sheet
+        deltas = match_stats(bat_df, bowl_df, field_df, warwick_win, motm)
+        known = [name in self.registry for name in deltas.index]
+        unknown = [name for name, is_known in zip(deltas.index, known) if not is_known]
+        deltas = deltas[known]
+        if deltas.empty:
+            return {'players': [], 'teams': {}, 'unknown': unknown}
+        rows = self.store.player_rows([self.registry.number(name) for name in deltas.index])
+
+        # Add the stats to the week and rescore only those players. The lock is held until the league table has been
+        # updated, so concurrent matches can't interleave their changes
+        with self._lock:
+            delta_array = deltas.reindex(columns=self.stat_names, fill_value=0).to_numpy()
+            week_stats = self.stats[:, week_index]
+            week_stats[rows] += delta_array
+            new_points = score(week_stats[rows], self.stat_names)
+            week_stats[np.ix_(rows, [self.stat_names.index(x) for x in POINTS_COLUMNS])] = new_points
+            point_changes = new_points[:, -1] - self.player_points[rows, week_index]
+            self.player_points[rows, week_index] = new_points[:, -1]
+
+            # Update the totals of the teams that picked those players
+            team_changes = {}
+            for row, change in zip(rows.tolist(), point_changes.tolist()):
+                if change == 0:
+                    continue
+                for team in self.player_teams.get(row, []):
+                    team_changes[team] = team_changes.get(team, 0) + change
+
+            # Move only the affected teams in the league table
+            old_positions = {team: pos for pos, team in enumerate(self.positions()) if team in team_changes}
+            for team, change in team_changes.items():
+                del self._order[bisect_left(self._order, (-self.team_totals[team], team))]
+                self.team_week_points[team, week_index] += change
+                self.team_totals[team] += change
+                insort(self._order, (-self.team_totals[team], team))
+            new_positions = {team: pos for pos, team in enumerate(self.positions()) if team in team_changes}
+
+            return {'players': list(deltas.index[point_changes != 0]),
+                    'teams': {self.team_names[team]: (old_positions[team] + 1, new_positions[team] + 1) for team in team_changes},
+                    'unknown': unknown}
+
+    def league_table_df(self):
+        """Returns the current league table as a dataframe, in the same format as table_data_manager.generate_league_table_df"""
+
+        with self._lock:
+            order = self.positions()
+            return pd.DataFrame({'Position': range(1, len(order) + 1),
+                                 'Team Name': [self.team_names[x] for x in order],
+                                 'Team Owner': [self.team_owners[x] for x in order],
+                                 'Total Points': self.team_totals[order]})
+
+
+def get_standings():
+    """Returns the standings engine for the current version of the sheets. Matches applied to it are kept until the
+    sheets change, at which point it is rebuilt from the downloaded data"""
+
+    return sheet_cache.get_derived('standings', ['TotalStats', 'TeamList'] + WEEK_SHEETS,
+                                   lambda: Standings(get_season_store(), sheet_cache.get_sheet('TeamList'),
+                                                     get_player_registry()))
@@ -0,0 +1,100 @@
+"""Module containing the standings history, which holds every team's cumulative points and league position after each
+week as (team x week) matrices. Positions use standard competition ranking, so teams level on points share a position
+and the next position is skipped (1, 2, 2, 4). The history is built once per version of the sheets"""
+
+import numpy as np
+import sheet_cache
+from series_prep import cumulative, played_weeks
+from season_store import WEEK_SHEETS
+from team_analytics import get_team_analytics
+
+
+def competition_ranks(points):
+    """Returns the league position of each team in each week, where the team with the most points is first and teams
+    level on points share a position
+
+    :param points An array of shape (team, week) of the points the teams are ranked on"""
+
+    points = np.asarray(points)
+    if points.size == 0:
+        return np.zeros(points.shape, dtype=int)
+
+    # Sort every week in decreasing order of points. Rounding stops float error from splitting teams that are level
+    rounded = np.round(points, 6)
+    order = np.argsort(-rounded, axis=0, kind='stable')
+    sorted_points = np.take_along_axis(rounded, order, axis=0)
+
+    # A team starts a new position when its points differ from the team above, otherwise it shares that team's position
+    positions = np.arange(1, points.shape[0] + 1)[:, None].repeat(points.shape[1], axis=1)
+    starts = np.ones(points.shape, dtype=bool)
+    starts[1:] = sorted_points[1:] != sorted_points[:-1]
+    sorted_ranks = np.maximum.accumulate(np.where(starts, positions, 0), axis=0)
+
+    # Put the positions back in team order
+    ranks = np.empty_like(sorted_ranks)
+    np.put_along_axis(ranks, order, sorted_ranks, axis=0)
+    return ranks
+
+
+class StandingsHistory:
+    """Every team's weekly points, cumulative points and league position after each week played so far
+
+    :param analytics The team analytics (from team_analytics.get_team_analytics())
+    :param team_owners The list of team owners, in TeamList order"""
+
+    def __init__(self, analytics, team_owners):
+        self.analytics = analytics
+        self.team_names = analytics.team_names
+        self.team_owners = list(team_owners)
+
+        # Only the weeks up to the last week any team has points in are part of the history
+        self.weeks = played_weeks(analytics.week_points)
+        self.week_points = analytics.week_points[:, :self.weeks]
+
+        # Cumulative points and league position, of shape (team, week)
+        self.cumulative = cumulative(self.week_points)
+        self.ranks = competition_ranks(self.cumulative)
+
+    def team_history(self, team_name):
+        """Returns a dictionary with the given team's name, owner, weekly points, cumulative points and position after
+        each week, or throws an exception if the team isn't on the TeamList
+
+        :param team_name The team name"""
+
+        team = self.analytics.team_index(team_name)
+        return {'team': self.team_names[team],
+                'owner': self.team_owners[team],
+                'points': self.week_points[team].tolist(),
+                'cumulative': self.cumulative[team].tolist(),
+                'position': self.ranks[team].tolist()}
+
+    def to_dict(self):
+        """Returns the whole history as a dictionary, with the teams in the order of the latest league positions"""
+
+        order = np.argsort(self.ranks[:, -1], kind='stable') if self.weeks else range(len(self.team_names))
+        return {'weeks': [f"Week {x}" for x in range(1, self.weeks + 1)],
+                'teams': [self.team_history(self.team_names[x]) for x in order]}
+
+    def head_to_head(self, team_a, team_b):
+        """Returns a dictionary comparing two teams week by week: each team's history, the points difference in each
+        week (positive when the first team scored more), and the number of weeks each team won or drew
+
+        :param team_a The name of the first team
+        :param team_b The name of the second team"""
+
+        a = self.analytics.team_index(team_a)
+        b = self.analytics.team_index(team_b)
+        difference = self.week_points[a] - self.week_points[b]
+        return {'weeks': [f"Week {x}" for x in range(1, self.weeks + 1)],
+                'teams': [self.team_history(team_a), self.team_history(team_b)],
+                'difference': difference.tolist(),
+                'wins': [int((difference > 0).sum()), int((difference < 0).sum())],
+                'draws': int((difference == 0).sum())}
+
+
+def get_standings_history():
+    """Returns the standings history for the current version of the sheets"""
+
+    return sheet_cache.get_derived('standings_history', ['TeamList', 'TotalStats'] + WEEK_SHEETS,
+                                   lambda: StandingsHistory(get_team_analytics(),
+                                                            sheet_cache.get_sheet('TeamList')['Team Owner']))
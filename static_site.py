@@ -0,0 +1,149 @@
+"""Module containing functions that pre-render every page of the site into static html files when the data is updated,
+and a hook that lets Flask serve those files directly. Run it as a script to build the site:
+
+    python static_site.py --out prebuilt --workers 4
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from flask import request, send_file
+import argparse
+import time
+import os
+import sheet_cache
+
+# Folder the pages are written to, and the file recording the data version they were rendered from
+SITE_DIR = "prebuilt"
+VERSION_FILE = "VERSION"
+
+# Test client of the app, created once in each worker process
+_client = None
+
+
+def site_urls():
+    """Returns a list of every url on the site. There is one page per team on the TeamList and one page per player on
+    the PlayerList, along with the fixed pages"""
+
+    urls = ["/", "/about", "/dream-teams", "/teams", "/players"]
+
+    # Names are linked with dashes instead of spaces (see the table_link macro)
+    team_names = sheet_cache.get_sheet("TeamList")['Team Name']
+    urls.extend(f"/teams/{x.strip().replace(' ', '-')}" for x in team_names)
+    player_names = sheet_cache.get_sheet("PlayerList")['Player Name']
+    urls.extend(f"/players/{x.strip().replace(' ', '-')}" for x in player_names)
+
+    return urls
+
+
+def url_to_path(url, out_dir):
+    """Returns the path of the html file for the given url, laid out so that a reverse proxy can serve url/index.html
+
+    :param url The url of the page
+    :param out_dir The folder the site is written to"""
+
+    return os.path.join(out_dir, *[x for x in url.split('/') if x], "index.html")
+
+
+def _render_pages(urls, out_dir):
+    """Renders the given urls with the app's test client and writes them to the output folder. Returns a list of
+    tuples of the form (url, status_code, seconds, bytes), one for each url
+
+    :param urls The list of urls to render
+    :param out_dir The folder the site is written to"""
+
+    global _client
+    if _client is None:
+        # Import here so that the parent process doesn't need to load the app
+        from app import app
+        _client = app.test_client()
+
+    results = []
+    for url in urls:
+        start = time.perf_counter()
+        response = _client.get(url)
+        seconds = time.perf_counter() - start
+
+        # Only write pages that rendered successfully
+        if response.status_code == 200:
+            path = url_to_path(url, out_dir)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(response.data)
+        results.append((url, response.status_code, seconds, len(response.data)))
+    return results
+
+
+def build_site(out_dir=SITE_DIR, workers=None):
+    """Renders every page of the site into the output folder using a process pool, and returns a list of tuples of the
+    form (url, status_code, seconds, bytes), one for each url
+
+    :param out_dir The folder to write the site to
+    :param workers The number of worker processes to use (defaults to the number of CPUs)"""
+
+    urls = site_urls()
+    version, _ = sheet_cache.data_version()
+
+    # Split the urls into one chunk per worker, so each worker only loads the app once
+    workers = workers or os.cpu_count() or 1
+    chunks = [urls[i::workers] for i in range(workers)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(_render_pages, chunks, [out_dir] * len(chunks)):
+            results.extend(chunk_results)
+
+    # Record the data version last, so the pages are only served once they have all been written
+    with open(os.path.join(out_dir, VERSION_FILE), 'w') as f:
+        f.write(version)
+
+    return results
+
+
+def serve_prebuilt(app, out_dir=SITE_DIR):
+    """Registers a hook on the given Flask app that serves pre-rendered pages when they were built from the current data.
+    Requests for pages that weren't pre-rendered, or that were rendered from old data, fall through to the normal routes
+
+    :param app The Flask app
+    :param out_dir The folder the site was written to"""
+
+    @app.before_request
+    def send_prebuilt_page():
+        if request.method != 'GET':
+            return None
+
+        # Check the pages were built from the current data
+        try:
+            with open(os.path.join(out_dir, VERSION_FILE)) as f:
+                built_version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if built_version != sheet_cache.data_version()[0]:
+            return None
+
+        # Only serve files inside the site folder, so paths containing '..' fall through to the normal routes
+        site_dir = os.path.realpath(out_dir)
+        path = os.path.realpath(url_to_path(request.path, out_dir))
+        if os.path.commonpath([site_dir, path]) != site_dir:
+            return None
+        if os.path.isfile(path):
+            return send_file(path, mimetype='text/html', conditional=True)
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render every page of the site into static html files")
+    parser.add_argument('--out', default=SITE_DIR, help="folder to write the site to")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = build_site(args.out, args.workers)
+    total = time.perf_counter() - start
+
+    # Report any failed pages and the render cost of the whole site
+    for url, status_code, _, _ in results:
+        if status_code != 200:
+            print(f"Failed to render {url} (status {status_code})")
+    render_seconds = sum(x[2] for x in results)
+    size = sum(x[3] for x in results)
+    print(f"Rendered {len(results)} pages ({size / 1e6:.1f} MB) in {total:.2f}s "
+          f"({render_seconds:.2f}s of render time, {render_seconds / max(len(results), 1) * 1000:.0f}ms per page)")
@@ -1,6 +1,10 @@
-from flask import render_template_string, render_template
 import pandas as pd
-import os
+import sheet_cache
+from player_registry import get_player_registry
+from roster_index import get_roster_index
+from dream_team_engine import dream_team_rows, get_dream_teams
+from scoring_engine import POINTS_RULES
+from table_renderer import render_table
 
 ###---------------------------------------------------------------------
 # Utility functions
@@ -11,55 +15,24 @@ def numbers_to_names(numbers):
     
     :param numbers The list of Player Numbers to get the names of"""
 
-    # Get total stats spreadsheet
-    total_stats = get_sheet_df('TotalStats')
-
-    # Get relevant columns
-    nums_and_names = total_stats[['Player Number', 'Player Name']]
-
-    # Get player name, or throw exception if the number is out of range
-    def number_to_name(number):
-        if number in list(nums_and_names['Player Number']):
-            player_name = nums_and_names['Player Name'].iloc[number - 1]
-            return player_name
-        else:
-            raise Exception(f"A Player with number {number} was not found. Check the player number matches one on the sheet")
-
-    return [number_to_name(x) for x in numbers]
+    # Look the numbers up in the player registry, which throws an exception if a number is not on the sheet
+    return list(get_player_registry().names(numbers))
 
 def names_to_numbers(names):
     """Returns a list of the numbers of players with the given names
     
     :param numbers The list of Player names to get the numbers of"""
     
-    # Get total stats spreadsheet
-    total_stats = get_sheet_df('TotalStats')
-
-    # Get relevant columns
-    nums_and_names = total_stats[['Player Number', 'Player Name']]
-    player_names = list(nums_and_names['Player Name'])
-
-    # Get player number, or throw exception if the number is out of range
-    def name_to_number(name):
-        if name in player_names:
-            player_num = player_names.index(name) + 1
-            return player_num
-        else:
-            raise Exception(f"The player {name} was not found. Check the player name matches one on the sheet")
-    
-    return [name_to_number(name) for name in names]
+    # Look the names up in the player registry, which throws an exception if a name is not on the sheet
+    return [int(x) for x in get_player_registry().numbers(names)]
 
 def get_sheet_df(sheet):
-    """Returns the given sheet as a dataframe
+    """Returns the given sheet as a dataframe. The dataframe is shared with other callers, so it must not be modified in place
     
     :param sheet The name of the sheet to be converted (name of the csv file without the extension '.csv')"""
     
-    sheet_path = os.path.join("data", f"{sheet}.csv")
-    if os.path.exists(sheet_path):
-        df = pd.read_csv(sheet_path)
-        return df
-    else:
-        raise Exception(f"Oopsie, {sheet} doesn't exist")
+    # Sheets are cached in-process, so this only parses the csv file when it has changed since it was last read
+    return sheet_cache.get_sheet(sheet)
 
 def generate_table_sheet(sheet):
     """Genereates a html table of the given sheet
@@ -80,16 +53,8 @@ def generate_table(df, link_columns=[]):
     The prefix is the page name that would naturally come before the link (e.g If the column name was 'Team Name', the corresponding prefix would be 'teams'. If the column
     name was 'Player Name', the corresponding prefix would be 'players"""
 
-    # Get table headings from dataframe
-    headings = list(df.columns)
-    
-    # Get index (in the list headings) of the column names that we want to link
-    link_columns_indices = [headings.index(x) for x, y in link_columns]
-
-    # Ger prefixes of the column names that we want to link
-    link_columns_prefixes = [y for x, y in link_columns]
-    
-    return render_template("table-template.html", df=df, headings=headings, link_column_indices=link_columns_indices, link_columns_prefixes=link_columns_prefixes)
+    # Render the table from the dataframe's columns, which is much faster than a template call for every cell
+    return render_table(df, link_columns)
 
 
 def team_to_owner(team_name, team_list_df):
@@ -110,27 +75,19 @@ def team_to_owner(team_name, team_list_df):
     else:
         raise Exception(f"Couldn't find {team_name} in the list of team names")
 
-def name_to_picks(player_name, team_list_df):
+def name_to_picks(player_name):
     """Returns a tuple. The first element is a list of tuples, each of the form (team_name, team_owner), where each tuple corresponds to a team that picked the given player.
     The second element is the total number of picks that the player has
     
-    :param player_name The player to get the picks of
-    :param team_list_df The dataframe containing the data needed (in this case we will have team_list_df = get_sheet_df('TeamList')"""
-
-    # Get team rosters
-    team_rosters = team_list_df.drop(['Week 1 Points', 'Week 2 Points', 'Week 3 Points', 'Week 4 Points', 'Week 5 Points', 'Week 6 Points',
-                                    'Week 7 Points', 'Week 8 Points', 'Week 9 Points', 'Week 10 Points', 'Total Points'], axis=1)
+    :param player_name The player to get the picks of"""
 
-    picks = []                 
-    for i, row in team_rosters.iterrows():
-        # Get team roster
-        roster = list(row)[3:]
-        roster = numbers_to_names(roster)
+    # Players that aren't on the TotalStats sheet can't have been picked
+    player_number = get_player_registry().name_to_number.get(player_name)
+    if player_number is None:
+        return [], 0
 
-        # Check if the player is in the team
-        if player_name in roster:
-            picks.append((row['Team Name'], row['Team Owner']))
-            
+    # Look the player up in the roster index
+    picks = [(team_name, team_owner) for team_name, team_owner, _ in get_roster_index().picks(player_number)]
     return picks, len(picks)
 
     
@@ -166,27 +123,9 @@ def generate_league_table_df():
 def generate_points_calculator_table():
     """Generates a table showing how the points are calculated for Fantasy Cricket"""
 
-    # Points for [runs, 4s, 6s, 50s, 100s, 150s, 200s, Ducks]
-    batting_points = [2.5, 2, 4, 30, 60, 90, 120, -15]
-
-    # Points for [wickets, 3fer, 5fer, 6+fer, economy, maiden]
-    bowling_points = [20, 30, 60, '60 + 15*(num. wickets above 5)', 'balls bowled - 0.5*(runs against)', 10]
-
-    # Points for [catch, run-out, stumping]
-    fielding_points = [15, 15, 15]
-
-    # Points for [match win, MOTM]
-    bonus_points = [10, 25]
-
-    # Merge lists
-    points = batting_points + bowling_points + fielding_points + bonus_points
-    print(points)
-
-    # Row names
-    row_names = ['Run', '4', '6', '50', '100', '150', '200', 'Duck',
-                    'Wicket', '3fer', '5fer', '6+fer', 'Economy', 'Maiden',
-                    'Catch', 'Run-out', 'Stumping',
-                    'Match Win', 'MOTM']
+    # Get the actions and their points from the scoring rules, which are also used to calculate the points columns
+    row_names = [rule.action for rule in POINTS_RULES]
+    points = [rule.points for rule in POINTS_RULES]
 
     # Generate dataframe
     points_df = pd.DataFrame(data=[row_names, points])
@@ -206,36 +145,35 @@ def generate_dream_team_table(df):
     
     :param df The dataframe to calculate this particular dream team. e.g. df = get_sheet_df('TotalStats') or df = get_sheet_df('Week1')"""
 
-    # Copy dataframe
-    stats = df.copy()
-    
+    # Pick the dream team from the TOTAL column
+    rows, degenerate = dream_team_rows(df['TOTAL'].fillna(0).to_numpy(), df['Player Role'].to_numpy())
+
     # Return an empty string if the Week's points column is all zeros (i.e either no points were scored or the week hasn't happened yet)
-    if sum(list(stats['TOTAL'])) == 0:
+    if degenerate[0]:
         return ""
 
-    # Discard unecessary columns so we're left with Player Name, Player Role and TOTAL
-    stats.drop(['Player Number', 'GAMES', 'RUNS', '4s', '6s', '50s', '100s', '150s', '200s', 'DUCKS', 'OVERS',
-                        'BALLS', 'WICKETS', 'RUNS AGAINST', 'MAIDENS', '3fers/4fers', '5fers', '6+fers',
-                        'CATCHES', 'RUN-OUTS', 'STUMPINGS', 'MOTM', 'WINS', 'BATTING', 'BOWLING', 'FIELDING', 'BONUS'], axis=1, inplace=True)
-
-    # Split dataframe into 4 different dataframes, one for each role
-    all_rounders = stats[stats['Player Role'] == 'All-Rounder']
-    batsmen = stats[stats['Player Role'] == 'Batsman']
-    bowlers = stats[stats['Player Role'] == 'Bowler']
-    wicket_keepers = stats[stats['Player Role'] == 'Wicket-keeper']
-
-    # Sort the dataframe for each role in desceding order of total points
-    all_rounders = all_rounders.sort_values(by=['TOTAL'], ascending=False)
-    batsmen = batsmen.sort_values(by=['TOTAL'], ascending=False)
-    bowlers = bowlers.sort_values(by=['TOTAL'], ascending=False)
-    wicket_keepers = wicket_keepers.sort_values(by=['TOTAL'], ascending=False)
-
     # Get the dream team
-    dream_team = pd.concat([batsmen.head(4), all_rounders.head(3), wicket_keepers.head(1), bowlers.head(3)])
+    picked = rows[:, 0][rows[:, 0] >= 0]
+    dream_team = df[['Player Name', 'Player Role', 'TOTAL']].iloc[picked]
     dream_team.columns = ['NAME', 'ROLE', 'POINTS']
 
     return generate_table(dream_team, link_columns=[('NAME', 'players')])
 
+def generate_dream_team_tables():
+    """Returns a tuple (current_team, week_nums, weekly_teams). current_team is the html table of the dream team based on the TotalStats sheet,
+    week_nums is a list of the weeks that have a dream team, and weekly_teams is a list of the html tables of those weeks' dream teams"""
+
+    # Every dream team is picked in one pass, once per data version
+    dream_teams = get_dream_teams()
+    current_team = dream_teams.team('TotalStats')
+    current_team = "" if current_team is None else generate_table(current_team, link_columns=[('NAME', 'players')])
+
+    # Generate the tables of the weeks that have a dream team
+    week_nums = dream_teams.active_weeks()
+    weekly_teams = [generate_table(dream_teams.team(f"Week{x}"), link_columns=[('NAME', 'players')]) for x in week_nums]
+
+    return current_team, week_nums, weekly_teams
+
 
 ###-------------------------------------------------------------
 # Tables for Teams page
@@ -309,18 +247,35 @@ def generate_players_table(player_list_df):
     # Return the table
     return generate_table(ordered_players, link_columns=[('Player Name', 'players')])
 
+def generate_most_picked_table(n):
+    """Generates a html table of the n most picked players, along with their roles and number of picks
+    
+    :param n The number of players to put in the table"""
+
+    # Get the most picked players from the roster index
+    registry = get_player_registry()
+    most_picked = get_roster_index().most_picked(n)
+    numbers = [number for number, _ in most_picked]
+
+    # Generate dataframe
+    df = pd.DataFrame({'Player Name': registry.names(numbers),
+                       'Role': registry.player_roles[registry.rows(numbers)],
+                       'Picks': [picks for _, picks in most_picked]})
+
+    # Return the table
+    return generate_table(df, link_columns=[('Player Name', 'players')])
+
 
 ###-------------------------------------------------------------
 # Tables for Player-stats page
 ###-------------------------------------------------------------
-def generate_picks_table(player_name, team_list_df):
+def generate_picks_table(player_name):
     """Returns a table containing which teams picked the given player, Returns an empty string if the player was not picked by anyone
     
-    :param team_name The player name to generate the picks table of
-    :param team_list_df The dataframe containing the data needed (in this case we will have team_list_df = get_sheet_df('TeamList')"""
+    :param team_name The player name to generate the picks table of"""
 
     # Get the teams that picked the given player
-    picks = name_to_picks(player_name, team_list_df)[0]
+    picks = name_to_picks(player_name)[0]
     
     # Generate table if picks is non-empty
     if picks:
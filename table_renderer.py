@@ -0,0 +1,100 @@
+"""Module containing the html table renderer. Tables are built straight from the dataframe's column arrays: each column
+is converted to text and escaped in one go, link columns get their hrefs precomputed, and the rows are then joined
+together. This produces the same markup as templates/table-template.html without a template call per cell. Run it as a
+script to compare it with the template on the PlayerList and TotalStats sheets"""
+
+from markupsafe import escape, Markup
+import re
+
+# The markup wrapped around the text of every cell
+CELL_DIV = '<div style="height:100%;width:100%">'
+
+
+def column_text(values):
+    """Returns a list of the escaped text of each value in the given column
+
+    :param values The column as a numpy array"""
+
+    # Only object columns can contain text that needs escaping, numbers are converted directly
+    if values.dtype == object:
+        return [str(escape(x)) for x in values.tolist()]
+    return [str(x) for x in values.tolist()]
+
+
+def render_table(df, link_columns=()):
+    """Returns a html table of the given dataframe
+
+    :param df The dataframe to generate a html table from
+    :param link_columns A list where each element is a tuple of the form (column name, prefix). The elements of the
+    column are links to /prefix/element, with dashes instead of spaces"""
+
+    headings = list(df.columns)
+    prefixes = {}
+    for column_name, prefix in link_columns:
+        prefixes.setdefault(column_name, prefix)
+
+    # Every row shares one dtype, as it would if the rows were read one at a time
+    values = df.to_numpy()
+
+    # Build every cell a column at a time
+    columns = []
+    for i, heading in enumerate(headings):
+        text = column_text(values[:, i])
+        if heading in prefixes:
+            links = [f'<a href="/{escape(prefixes[heading])}/{escape(str(x).replace(" ", "-"))}">'
+                     for x in values[:, i].tolist()]
+            columns.append([f'<td>{a}{CELL_DIV}{x}</div></a></td>' for a, x in zip(links, text)])
+        else:
+            columns.append([f'<td><a>{CELL_DIV}{x}</div></a></td>' for x in text])
+
+    head = ''.join(f'<th scope="col">{escape(x)}</th>' for x in headings)
+    rows = '\n'.join(f"    <tr>{''.join(cells)}</tr>" for cells in zip(*columns))
+
+    return Markup('<table class="table table-striped table-dark">\n'
+                  f'  <thead>\n    <tr>{head}</tr>\n  </thead>\n'
+                  f'  <tbody>\n{rows}\n  </tbody>\n'
+                  '</table>')
+
+
+def normalise_markup(html):
+    """Returns the given markup with the whitespace between and inside tags removed, so tables rendered with different
+    indentation can be compared
+
+    :param html The markup to normalise"""
+
+    html = re.sub(r"\s+", ' ', str(html))
+    return re.sub(r"\s*([<>])\s*", r"\1", html).strip()
+
+
+if __name__ == "__main__":
+    import time
+    from flask import render_template
+    from app import app
+    import sheet_cache
+
+    def render_template_table(df, link_columns):
+        # The table-template.html rendering this module replaces
+        headings = list(df.columns)
+        return render_template("table-template.html", df=df, headings=headings,
+                               link_column_indices=[headings.index(x) for x, _ in link_columns],
+                               link_columns_prefixes=[y for _, y in link_columns])
+
+    def best_time(render, repeat=20):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            html = render()
+            times.append(time.perf_counter() - start)
+        return min(times), html
+
+    with app.test_request_context():
+        for sheet in ['PlayerList', 'TotalStats']:
+            df = sheet_cache.get_sheet(sheet)
+            link_columns = [('Player Name', 'players')]
+            template_seconds, template_html = best_time(lambda: render_template_table(df, link_columns))
+            engine_seconds, engine_html = best_time(lambda: render_table(df, link_columns))
+            same = normalise_markup(template_html) == normalise_markup(engine_html)
+
+            print(f"{sheet} ({df.shape[0]} rows x {df.shape[1]} columns): template {template_seconds * 1000:.2f}ms, "
+                  f"renderer {engine_seconds * 1000:.2f}ms ({template_seconds / engine_seconds:.0f}x faster), "
+                  f"{'same markup' if same else 'DIFFERENT MARKUP'}")
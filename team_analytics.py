@@ -0,0 +1,79 @@
+"""Module containing the team analytics, which hold every team's points as a (team x slot x week) tensor along with
+each roster player's season points by category. They are built once per version of the sheets, so the team pages and
+the league tracker only slice them"""
+
+import numpy as np
+import pandas as pd
+import sheet_cache
+from player_registry import get_player_registry
+from roster_index import ROSTER_SLOTS
+from season_store import get_season_store, WEEK_SHEETS, CATEGORY_COLUMNS
+
+
+class TeamAnalytics:
+    """The points of every team on the TeamList sheet, broken down by roster slot and week
+
+    :param team_list_df The TeamList dataframe
+    :param total_stats_df The TotalStats dataframe
+    :param store The season store holding the weekly stats (from season_store.get_season_store())
+    :param registry The player registry (from player_registry.get_player_registry())"""
+
+    def __init__(self, team_list_df, total_stats_df, store, registry):
+        self.team_names = list(team_list_df['Team Name'])
+        self.team_index_by_name = {name: i for i, name in reversed(list(enumerate(self.team_names)))}
+        self.weeks = list(store.weeks)
+
+        # Player numbers and names of each team's roster, of shape (team, slot). The roster's rows on TotalStats and in
+        # the season store are looked up separately by Player Number, since the sheets may list players in different
+        # orders
+        self.roster_numbers = team_list_df[ROSTER_SLOTS].astype(int).to_numpy()
+        self.roster_rows = registry.rows(self.roster_numbers.ravel()).reshape(self.roster_numbers.shape)
+        self.roster_store_rows = store.player_rows(self.roster_numbers)
+        self.roster_names = np.asarray(registry.names(self.roster_numbers.ravel()),
+                                       dtype=object).reshape(self.roster_numbers.shape)
+
+        # Each roster player's weekly points, of shape (team, slot, week)
+        self.points = np.asarray(store.stat('TOTAL'))[self.roster_store_rows]
+
+        # Each team's weekly points as recorded on the TeamList sheet, of shape (team, week)
+        self.week_points = team_list_df[[f"Week {x} Points" for x in range(1, len(self.weeks) + 1)]].to_numpy()
+
+        # Each roster player's season points by category, of shape (team, slot, category)
+        self.categories = total_stats_df[CATEGORY_COLUMNS].to_numpy()[self.roster_rows]
+
+    def team_index(self, team_name):
+        """Returns the row of the given team on the TeamList sheet, or throws an exception if the team isn't on it
+
+        :param team_name The team name"""
+
+        if team_name not in self.team_index_by_name:
+            raise Exception(f"Couldn't find '{team_name}' on the TeamList")
+        return self.team_index_by_name[team_name]
+
+    def breakdown_df(self, team_name):
+        """Returns a dataframe with a row for each player in the given team's roster, with the columns Role, Name and
+        the player's points in each week
+
+        :param team_name The team name"""
+
+        team = self.team_index(team_name)
+        df = pd.DataFrame({'Role': ROSTER_SLOTS, 'Name': list(self.roster_names[team])})
+        for i, week in enumerate(self.weeks):
+            df[week] = self.points[team, :, i]
+        return df
+
+    def team_week_points(self, team_names):
+        """Returns an array of shape (team, week) of the weekly points of the given teams
+
+        :param team_names The list of team names"""
+
+        return self.week_points[[self.team_index(x) for x in team_names]]
+
+
+def get_team_analytics():
+    """Returns the team analytics for the current version of the sheets"""
+
+    return sheet_cache.get_derived('team_analytics', ['TeamList', 'TotalStats'] + WEEK_SHEETS,
+                                   lambda: TeamAnalytics(sheet_cache.get_sheet('TeamList'),
+                                                         sheet_cache.get_sheet('TotalStats'),
+                                                         get_season_store(), get_player_registry()))